@@ -1,19 +1,52 @@
-from flask import Flask, request, jsonify
+import os
+
+# One BLAS/OpenMP thread per inference call; concurrency comes from the
+# inference pool instead (must be set before numpy is imported)
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
+from flask import Flask, request, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
 import joblib
-import os
+import orjson
+import pickle
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import lru_cache
 import logging
+import math
+from sklearn.preprocessing import StandardScaler
 from ml_utils import WaterQualityPredictor, DataProcessor
 import json
 
+try:
+    import onnxruntime
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson for request parsing and jsonify"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # Configure CORS for production
 CORS(app, origins=[
@@ -35,21 +68,56 @@ data_processor = DataProcessor()
 # Global variables for model and scaler
 model = None
 scaler = None
+onnx_session = None
+scaler_fold = None
+model_loaded = False
+model_meta = {}
 feature_names = ['ph', 'hardness', 'solids', 'chloramines', 'sulfate', 'conductivity', 'organic_carbon', 'trihalomethanes', 'turbidity']
+REQUIRED_FIELDS = frozenset(feature_names)
+
+# Leading bytes of the compressed formats joblib.dump can write (zlib, gzip,
+# bz2, xz, lzma, lz4)
+JOBLIB_COMPRESSED_MAGIC = (b'\x78', b'\x1f\x8b', b'BZh', b'\xfd7zXZ', b'\x5d\x00', b'\x04\x22\x4d\x18')
+
+def is_joblib_artifact(data):
+    """True if the file bytes were written by joblib.dump rather than pickle.dump"""
+    # Uncompressed joblib files are pickles whose arrays are NumpyArrayWrapper
+    # records followed by raw buffers that plain pickle cannot read
+    return data.startswith(JOBLIB_COMPRESSED_MAGIC) or b'joblib.numpy_pickle' in data
+
+def load_artifact(path):
+    """Load a pickled model/scaler, using joblib for files joblib.dump wrote"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    
+    if is_joblib_artifact(data):
+        logger.info(f"Loading {path} with joblib")
+        return joblib.load(path)
+    
+    logger.info(f"Loading {path} with pickle")
+    return pickle.loads(data)
+
+def save_artifact(obj, path):
+    """Persist a model/scaler with raw pickle protocol 5 for fast loading"""
+    with open(path, 'wb') as f:
+        pickle.dump(obj, f, protocol=5)
 
-def load_model():
-    """Load the trained model and scaler"""
-    global model, scaler
+def load_model(force=False):
+    """Load the trained model and scaler (no-op if already loaded unless forced)"""
+    global model, scaler, onnx_session, scaler_fold, model_loaded, model_meta
+    if model_loaded and not force:
+        return
+    
     try:
         if os.path.exists('model.pkl'):
-            model = joblib.load('model.pkl')
+            model = load_artifact('model.pkl')
             logger.info("Model loaded successfully")
         else:
             logger.warning("Model file not found, using default predictor")
             model = water_quality_predictor.get_default_model()
             
         if os.path.exists('scaler.pkl'):
-            scaler = joblib.load('scaler.pkl')
+            scaler = load_artifact('scaler.pkl')
             logger.info("Scaler loaded successfully")
         else:
             logger.warning("Scaler file not found, using default scaler")
@@ -59,19 +127,283 @@ def load_model():
         logger.error(f"Error loading model: {str(e)}")
         model = water_quality_predictor.get_default_model()
         scaler = water_quality_predictor.get_default_scaler()
+    
+    cast_scaler_to_float32(scaler)
+    scaler_fold = fold_scaler(scaler)
+    onnx_session = build_onnx_session(model)
+    
+    # Compile the quality score kernel now rather than on the first request
+    water_quality_predictor.calculate_quality_score({})
+    
+    # Model metadata only changes on reload, so /model-info serves it from here
+    model_meta = {
+        'model_type': type(model).__name__ if model is not None else 'None',
+        'feature_importance': water_quality_predictor.get_feature_importance() if model is not None else None
+    }
+    model_loaded = True
+    
+    # Cached predictions belong to the previous model
+    _cached_predict.cache_clear()
+
+def cast_scaler_to_float32(fitted_scaler):
+    """Store scaler statistics as float32 so float32 inputs are never upcast"""
+    for attr in ('mean_', 'scale_', 'var_'):
+        value = getattr(fitted_scaler, attr, None)
+        if value is not None:
+            setattr(fitted_scaler, attr, value.astype(np.float32))
+
+def fold_scaler(fitted_scaler):
+    """Precompute (1 / scale, -mean / scale) so scaling is one in-place multiply-add
+    
+    Only a fitted StandardScaler is folded; anything else (other scaler types, or an
+    unfitted one, which scaler.transform() reports) returns None.
+    """
+    if not isinstance(fitted_scaler, StandardScaler) or not hasattr(fitted_scaler, 'n_features_in_'):
+        return None
+    
+    count = fitted_scaler.n_features_in_
+    inv_scale = 1.0 / fitted_scaler.scale_ if fitted_scaler.with_std else np.ones(count)
+    offset = -fitted_scaler.mean_ * inv_scale if fitted_scaler.with_mean else np.zeros(count)
+    return inv_scale.astype(np.float32), offset.astype(np.float32)
+
+def build_onnx_session(sk_model):
+    """Convert the classifier to an ONNX Runtime session, or None to stay on sklearn"""
+    if not ONNX_AVAILABLE:
+        logger.info("onnxruntime/skl2onnx not installed, using sklearn for inference")
+        return None
+    
+    try:
+        onnx_model = convert_sklearn(
+            sk_model,
+            initial_types=[('X', FloatTensorType([None, len(feature_names)]))],
+            options={id(sk_model): {'zipmap': False}}
+        )
+        session = onnxruntime.InferenceSession(
+            onnx_model.SerializeToString(),
+            providers=['CPUExecutionProvider']
+        )
+        logger.info("ONNX Runtime session ready for inference")
+        return session
+    except Exception as e:
+        logger.warning(f"ONNX conversion failed, using sklearn for inference: {str(e)}")
+        return None
+
+# Cached ISO timestamp for hot endpoints, refreshed by a daemon thread
+_TIMESTAMP_REFRESH_SECONDS = 0.05
+_timestamp = datetime.now().isoformat()
+
+def _refresh_timestamp():
+    """Keep the cached ISO timestamp current"""
+    global _timestamp
+    while True:
+        _timestamp = datetime.now().isoformat()
+        time.sleep(_TIMESTAMP_REFRESH_SECONDS)
+
+def current_timestamp():
+    """ISO timestamp accurate to ~50 ms (use datetime.now() where exact time matters)"""
+    return _timestamp
+
+def start_timestamp_refresh():
+    """Start the timestamp refresher thread for this process"""
+    threading.Thread(target=_refresh_timestamp, name="timestamp-refresh", daemon=True).start()
+
+start_timestamp_refresh()
+
+def ojson(obj, status=200):
+    """Serialize a response body with orjson (handles NumPy scalars/arrays natively)"""
+    return Response(
+        orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS),
+        status=status,
+        mimetype='application/json'
+    )
+
+def build_feature_matrix(samples):
+    """Stack input samples into an (N, 9) feature matrix ordered by feature_names"""
+    return np.fromiter(
+        (sample[name] for sample in samples for name in feature_names),
+        dtype=np.float32,
+        count=len(samples) * len(feature_names)
+    ).reshape(-1, len(feature_names))
+
+def predict_features(features):
+    """Scale and predict an (N, 9) float32 feature matrix with a single model call
+    
+    Scaling happens in place, so callers must pass a matrix they own.
+    """
+    fold = scaler_fold
+    if fold is not None:
+        inv_scale, offset = fold
+        features *= inv_scale
+        features += offset
+        scaled_features = features
+    else:
+        scaled_features = scaler.transform(features)
+    
+    # One tree traversal: derive the label from the probabilities instead of
+    # calling predict() as well (predict() is argmax over predict_proba())
+    session = onnx_session
+    if session is not None:
+        prediction_proba = session.run(None, {'X': scaled_features.astype(np.float32, copy=False)})[1]
+    else:
+        prediction_proba = model.predict_proba(scaled_features)
+    predictions = model.classes_.take(prediction_proba.argmax(axis=1))
+    confidences = prediction_proba.max(axis=1) * 100
+    
+    return predictions, confidences
+
+def predict_samples(samples):
+    """Scale and predict a list of samples with a single model call"""
+    return predict_features(build_feature_matrix(samples))
+
+# Dedicated pool for scikit-learn calls so request threads only wait on results
+INFERENCE_TIMEOUT = 5.0
+_inference_executor = None
+_inference_executor_lock = threading.Lock()
+
+def get_inference_executor():
+    """Create the inference pool on first use, inside the serving worker
+    
+    Created lazily so its queue and threads belong to the forked worker
+    rather than the preloading master.
+    """
+    global _inference_executor
+    if _inference_executor is None:
+        with _inference_executor_lock:
+            if _inference_executor is None:
+                _inference_executor = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get('INFERENCE_WORKERS', 2)),
+                    thread_name_prefix="inference"
+                )
+    return _inference_executor
+
+class BatchScheduler:
+    """Collects concurrent /predict requests into micro-batches for one model call"""
+    
+    def __init__(self, batch_size=64, batch_timeout_ms=10, request_timeout=INFERENCE_TIMEOUT):
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout_ms / 1000.0
+        self.request_timeout = request_timeout
+        self.pending = None
+        self.worker = None
+        self._lock = threading.Lock()
+    
+    def _ensure_worker(self):
+        """Create the queue and start the worker thread on first use (after any server fork)"""
+        if self.worker is None:
+            with self._lock:
+                if self.worker is None:
+                    self.pending = queue.Queue()
+                    self.worker = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+                    self.worker.start()
+    
+    def submit(self, features):
+        """Queue a single feature row and block until its prediction is ready"""
+        self._ensure_worker()
+        
+        slot = {'event': threading.Event()}
+        self.pending.put((features, slot))
+        
+        if not slot['event'].wait(self.request_timeout):
+            raise TimeoutError("Timed out waiting for batched prediction")
+        if 'error' in slot:
+            raise slot['error']
+        
+        return slot['prediction'], slot['confidence']
+    
+    def _collect_batch(self):
+        """Wait for one request, then drain more until the batch is full or times out"""
+        batch = [self.pending.get()]
+        deadline = time.monotonic() + self.batch_timeout
+        
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        return batch
+    
+    def _run(self):
+        """Worker loop: hand each batch to the inference pool and keep collecting"""
+        while True:
+            batch = self._collect_batch()
+            get_inference_executor().submit(self._predict_batch, batch)
+    
+    def _predict_batch(self, batch):
+        """Predict a batch with one stacked model call and wake its callers"""
+        slots = [slot for _, slot in batch]
+        
+        try:
+            predictions, confidences = predict_features(np.vstack([features for features, _ in batch]))
+            for slot, prediction, confidence in zip(slots, predictions, confidences):
+                slot['prediction'] = prediction
+                slot['confidence'] = confidence
+        except Exception as e:
+            logger.error(f"Error in batched prediction: {str(e)}")
+            for slot in slots:
+                slot['error'] = e
+        
+        for slot in slots:
+            slot['event'].set()
+
+batch_scheduler = BatchScheduler(
+    batch_size=int(os.environ.get('BATCH_SIZE', 64)),
+    batch_timeout_ms=float(os.environ.get('BATCH_TIMEOUT_MS', 10))
+)
+
+_thread_state = threading.local()
+
+def thread_feature_buffer():
+    """Per-thread preallocated feature row, reused across requests
+    
+    Safe to reuse because submit() blocks until the worker has copied the row
+    into its stacked batch.
+    """
+    buffer = getattr(_thread_state, 'features', None)
+    if buffer is None:
+        buffer = _thread_state.features = np.empty(len(feature_names), dtype=np.float32)
+    return buffer
+
+@lru_cache(maxsize=4096)
+def _cached_predict(key):
+    """Predict a single sample keyed by its rounded feature tuple"""
+    features = thread_feature_buffer()
+    features[:] = key
+    prediction, confidence = batch_scheduler.submit(features)
+    return int(prediction), float(confidence)
+
+def prediction_cache_key(input_data):
+    """Quantize input features to 2 decimals so near-identical readings share a cache entry"""
+    return tuple(round(float(input_data[name]), 2) for name in feature_names)
 
 # Load model on startup
 load_model()
 
+def _reinit_after_fork():
+    """Restore per-process state in workers forked after import (gunicorn --preload)"""
+    global onnx_session
+    
+    # Threads do not survive fork; the model arrays are shared copy-on-write
+    start_timestamp_refresh()
+    
+    # ONNX Runtime sessions own thread pools, so each worker needs its own
+    if onnx_session is not None:
+        onnx_session = build_onnx_session(model)
+
+os.register_at_fork(after_in_child=_reinit_after_fork)
+
 # Health check endpoint for Railway
 @app.route('/health')
 def health_check():
     """Health check endpoint for deployment monitoring"""
-    return jsonify({
+    return ojson({
         'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': current_timestamp(),
         'service': 'AquaSentinel Backend API'
-    }), 200
+    }, 200)
 
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -79,40 +411,21 @@ def predict():
     try:
         # Get input data
         input_data = request.json
-        logger.info(f"Received prediction request: {input_data}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received prediction request: %r", input_data)
         
         # Validate input
-        required_fields = ['ph', 'turbidity', 'conductivity', 'hardness', 'solids', 'chloramines', 'sulfate', 'organic_carbon', 'trihalomethanes']
-        missing_fields = [field for field in required_fields if field not in input_data]
+        missing = REQUIRED_FIELDS.difference(input_data)
         
-        if missing_fields:
-            return jsonify({
+        if missing:
+            missing_fields = [field for field in feature_names if field in missing]
+            return ojson({
                 'status': 'error',
                 'message': f'Missing required fields: {missing_fields}'
-            }), 400
-        
-        # Prepare data for prediction
-        features = np.array([[
-            input_data['ph'],
-            input_data['hardness'],
-            input_data['solids'],
-            input_data['chloramines'],
-            input_data['sulfate'],
-            input_data['conductivity'],
-            input_data['organic_carbon'],
-            input_data['trihalomethanes'],
-            input_data['turbidity']
-        ]])
-        
-        # Scale features
-        scaled_features = scaler.transform(features)
+            }, 400)
         
-        # Make prediction
-        prediction = model.predict(scaled_features)[0]
-        prediction_proba = model.predict_proba(scaled_features)[0]
-        
-        # Calculate confidence
-        confidence = float(np.max(prediction_proba) * 100)
+        # Make prediction (cached, micro-batched with concurrent requests on a miss)
+        prediction, confidence = _cached_predict(prediction_cache_key(input_data))
         
         # Determine quality status
         quality_status = "Potable" if prediction == 1 else "Non-potable"
@@ -130,33 +443,35 @@ def predict():
             'confidence': confidence,
             'quality_score': quality_score,
             'insights': insights,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': current_timestamp(),
             'input_data': input_data
         }
         
-        logger.info(f"Prediction result: {result}")
-        return jsonify(result)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Prediction result: %r", result)
+        return ojson(result)
         
     except Exception as e:
         logger.error(f"Error in prediction: {str(e)}")
-        return jsonify({
+        return ojson({
             'status': 'error',
             'message': str(e)
-        }), 500
+        }, 500)
 
 @app.route('/analyze', methods=['POST'])
 def analyze():
     """Analyze water quality data and provide detailed insights"""
     try:
         input_data = request.json
-        logger.info(f"Received analysis request: {input_data}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received analysis request: %r", input_data)
         
         # Validate input
         if 'data' not in input_data:
-            return jsonify({
+            return ojson({
                 'status': 'error',
                 'message': 'Missing data field'
-            }), 400
+            }, 400)
         
         data = input_data['data']
         
@@ -179,17 +494,17 @@ def analyze():
             'feature_importance': feature_importance,
             'recommendations': recommendations,
             'anomalies': anomalies,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': current_timestamp()
         }
         
-        return jsonify(result)
+        return ojson(result)
         
     except Exception as e:
         logger.error(f"Error in analysis: {str(e)}")
-        return jsonify({
+        return ojson({
             'status': 'error',
             'message': str(e)
-        }), 500
+        }, 500)
 
 @app.route('/train', methods=['POST'])
 def train():
@@ -200,10 +515,10 @@ def train():
         
         # Check if training data is provided
         if 'training_data' not in input_data:
-            return jsonify({
+            return ojson({
                 'status': 'error',
                 'message': 'No training data provided'
-            }), 400
+            }, 400)
         
         training_data = input_data['training_data']
         
@@ -214,11 +529,11 @@ def train():
         training_result = water_quality_predictor.train_model(df)
         
         # Save model and scaler
-        joblib.dump(water_quality_predictor.model, 'model.pkl')
-        joblib.dump(water_quality_predictor.scaler, 'scaler.pkl')
+        save_artifact(water_quality_predictor.model, 'model.pkl')
+        save_artifact(water_quality_predictor.scaler, 'scaler.pkl')
         
         # Reload the global model and scaler
-        load_model()
+        load_model(force=True)
         
         result = {
             'status': 'success',
@@ -227,14 +542,14 @@ def train():
         }
         
         logger.info("Model training completed successfully")
-        return jsonify(result)
+        return ojson(result)
         
     except Exception as e:
         logger.error(f"Error in training: {str(e)}")
-        return jsonify({
+        return ojson({
             'status': 'error',
             'message': str(e)
-        }), 500
+        }, 500)
 
 @app.route('/model-info', methods=['GET'])
 def model_info():
@@ -242,102 +557,111 @@ def model_info():
     try:
         info = {
             'status': 'success',
-            'model_type': type(model).__name__ if model else 'None',
+            'model_type': model_meta.get('model_type', 'None'),
             'feature_names': feature_names,
             'model_loaded': model is not None,
             'scaler_loaded': scaler is not None,
-            'feature_importance': water_quality_predictor.get_feature_importance() if model else None,
-            'timestamp': datetime.now().isoformat()
+            'feature_importance': model_meta.get('feature_importance'),
+            'timestamp': current_timestamp()
         }
         
-        return jsonify(info)
+        return ojson(info)
         
     except Exception as e:
         logger.error(f"Error getting model info: {str(e)}")
-        return jsonify({
+        return ojson({
             'status': 'error',
             'message': str(e)
-        }), 500
+        }, 500)
 
 @app.route('/batch-predict', methods=['POST'])
 def batch_predict():
     """Batch prediction for multiple samples"""
     try:
         input_data = request.json
-        logger.info(f"Received batch prediction request for {len(input_data.get('samples', []))} samples")
+        logger.info("Received batch prediction request for %d samples", len(input_data.get('samples', [])))
         
         if 'samples' not in input_data:
-            return jsonify({
+            return ojson({
                 'status': 'error',
                 'message': 'No samples provided'
-            }), 400
+            }, 400)
         
         samples = input_data['samples']
         results = []
         
-        for sample in samples:
-            # Prepare features
-            features = np.array([[
-                sample['ph'],
-                sample['hardness'],
-                sample['solids'],
-                sample['chloramines'],
-                sample['sulfate'],
-                sample['conductivity'],
-                sample['organic_carbon'],
-                sample['trihalomethanes'],
-                sample['turbidity']
-            ]])
-            
-            # Scale and predict
-            scaled_features = scaler.transform(features)
-            prediction = model.predict(scaled_features)[0]
-            prediction_proba = model.predict_proba(scaled_features)[0]
-            confidence = float(np.max(prediction_proba) * 100)
-            
+        # Nothing to predict; the model rejects a 0-row matrix
+        if not samples:
+            return ojson({
+                'status': 'success',
+                'results': results,
+                'timestamp': current_timestamp()
+            })
+        
+        # Scale and predict all samples in one call
+        predictions, confidences = get_inference_executor().submit(predict_samples, samples).result(timeout=INFERENCE_TIMEOUT)
+        
+        for sample, prediction, confidence in zip(samples, predictions, confidences):
             results.append({
                 'prediction': int(prediction),
                 'quality_status': "Potable" if prediction == 1 else "Non-potable",
-                'confidence': confidence,
+                'confidence': float(confidence),
                 'quality_score': water_quality_predictor.calculate_quality_score(sample),
                 'input_data': sample
             })
         
-        return jsonify({
+        return ojson({
             'status': 'success',
             'results': results,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': current_timestamp()
         })
         
     except Exception as e:
         logger.error(f"Error in batch prediction: {str(e)}")
-        return jsonify({
+        return ojson({
             'status': 'error',
             'message': str(e)
-        }), 500
+        }, 500)
+
+# Pre-serialized response templates for the polling endpoints; only the
+# changing numbers are spliced in per request
+CURRENT_SENSOR_TEMPLATE = (
+    b'{"tds":%.2f,"ph":%.2f,"orp":%.2f,"turbidity":%.3f,"temperature":%.2f,'
+    b'"timestamp":"%s","quality_status":"excellent"}'
+)
+
+ML_ANALYSIS_TEMPLATE = (
+    b'{"filter_saturation":%.1f,"days_remaining":%d,"confidence":%.3f,"efficiency":%.1f,'
+    b'"recommendations":["Filter replacement recommended in 2 weeks","pH levels are optimal",'
+    b'"TDS within acceptable range"],"timestamp":"%s",'
+    b'"parameters":{"hours":%d,"tds":%.2f,"ph":%.2f}}'
+)
+
+# Shared generator for simulated sensor data: [tds, ph, orp, turbidity, temperature]
+RNG = np.random.Generator(np.random.PCG64DXSM())
+SENSOR_CENTER = np.array([200.0, 7.0, 450.0, 0.5, 22.0])
+SENSOR_SPREAD = np.array([50.0, 0.5, 100.0, 0.2, 2.0])
+
+def simulate_sensor_values(count):
+    """Draw `count` simulated readings as a (count, 5) array in one call"""
+    return SENSOR_CENTER + RNG.uniform(-1.0, 1.0, size=(count, 5)) * SENSOR_SPREAD
+
+def json_bytes_response(body, status=200):
+    """Wrap an already-serialized JSON body in a response"""
+    return Response(body, status=status, mimetype='application/json')
 
 @app.route('/sensors/current', methods=['GET'])
 def get_current_sensor_data():
     """Get current sensor readings"""
     try:
         # Generate realistic sensor data
-        import random
-        import time
-        
-        current_data = {
-            'tds': round(200 + random.uniform(-50, 50), 2),
-            'ph': round(7.0 + random.uniform(-0.5, 0.5), 2),
-            'orp': round(450 + random.uniform(-100, 100), 2),
-            'turbidity': round(0.5 + random.uniform(-0.2, 0.2), 3),
-            'temperature': round(22 + random.uniform(-2, 2), 2),
-            'timestamp': datetime.now().isoformat(),
-            'quality_status': 'excellent'
-        }
+        values = simulate_sensor_values(1)[0].tolist()
+        body = CURRENT_SENSOR_TEMPLATE % (*values, current_timestamp().encode())
         
-        return jsonify(current_data)
+        return json_bytes_response(body)
     except Exception as e:
         logger.error(f"Error getting current sensor data: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/sensors/history', methods=['GET'])
 def get_sensor_history():
@@ -345,30 +669,25 @@ def get_sensor_history():
     try:
         hours = int(request.args.get('hours', 24))
         
-        # Generate historical data
-        import random
-        from datetime import datetime, timedelta
-        
-        history = []
-        now = datetime.now()
-        
-        for i in range(hours):
-            timestamp = now - timedelta(hours=i)
-            reading = {
-                'tds': round(200 + random.uniform(-50, 50), 2),
-                'ph': round(7.0 + random.uniform(-0.5, 0.5), 2),
-                'orp': round(450 + random.uniform(-100, 100), 2),
-                'turbidity': round(0.5 + random.uniform(-0.2, 0.2), 3),
-                'temperature': round(22 + random.uniform(-2, 2), 2),
-                'timestamp': timestamp.isoformat(),
-                'quality_status': 'excellent'
-            }
-            history.append(reading)
-        
-        return jsonify(history)
+        # Generate historical data in one vectorized draw (one row per hour)
+        values = simulate_sensor_values(max(hours, 0))
+        
+        now = np.datetime64(datetime.now(), 'us')
+        timestamps = np.datetime_as_string(now - np.arange(len(values)).astype('timedelta64[h]'), unit='us')
+        
+        def generate():
+            """Stream the JSON array one reading at a time"""
+            yield b'['
+            for i, (row, timestamp) in enumerate(zip(values.tolist(), timestamps.tolist())):
+                if i:
+                    yield b','
+                yield CURRENT_SENSOR_TEMPLATE % (*row, timestamp.encode())
+            yield b']'
+        
+        return Response(stream_with_context(generate()), mimetype='application/json')
     except Exception as e:
         logger.error(f"Error getting sensor history: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/ml/analyze', methods=['GET'])
 def get_ml_analysis():
@@ -378,35 +697,32 @@ def get_ml_analysis():
         tds = float(request.args.get('tds', 200))
         ph = float(request.args.get('ph', 7.0))
         
-        # Generate ML analysis
-        import random
-        
-        analysis = {
-            'filter_saturation': round(random.uniform(30, 70), 1),
-            'days_remaining': random.randint(10, 30),
-            'confidence': round(random.uniform(0.85, 0.98), 3),
-            'efficiency': round(random.uniform(80, 95), 1),
-            'recommendations': [
-                'Filter replacement recommended in 2 weeks',
-                'pH levels are optimal',
-                'TDS within acceptable range'
-            ],
-            'timestamp': datetime.now().isoformat(),
-            'parameters': {
-                'hours': hours,
-                'tds': tds,
-                'ph': ph
-            }
-        }
+        # float() accepts nan/inf, which have no JSON representation
+        if not (math.isfinite(tds) and math.isfinite(ph)):
+            return ojson({'error': 'tds and ph must be finite numbers'}, 400)
         
-        return jsonify(analysis)
+        # Generate ML analysis
+        saturation, confidence, efficiency = RNG.uniform([30, 0.85, 80], [70, 0.98, 95]).tolist()
+        
+        body = ML_ANALYSIS_TEMPLATE % (
+            saturation,
+            int(RNG.integers(10, 30, endpoint=True)),
+            confidence,
+            efficiency,
+            current_timestamp().encode(),
+            hours,
+            tds,
+            ph
+        )
+        
+        return json_bytes_response(body)
     except Exception as e:
         logger.error(f"Error getting ML analysis: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 if __name__ == '__main__':
-    # Load model on startup
-    load_model()
+    # Local development server only; production runs gunicorn with
+    # gunicorn.conf.py (gthread workers, preloaded model)
     
     # Get port from environment variable (for Render.com deployment)
     port = int(os.environ.get('PORT', 8000))
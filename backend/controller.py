@@ -4,16 +4,26 @@ Manages valve operations, filter controls, and drone dispatch commands
 """
 
 import asyncio
+import heapq
+import itertools
 import json
 import logging
 import serial
 import time
-from datetime import datetime
-from typing import Dict, Optional, List
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Optional, List, Tuple, Union
 from enum import Enum
 import os
 from dotenv import load_dotenv
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Load environment variables
 load_dotenv()
 
@@ -21,6 +31,34 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bounds for per-process bookkeeping so long-running servers don't grow without limit
+COMMAND_HISTORY_SIZE = 256
+MAX_TRACKED_MISSIONS = 1024
+
+# Simulated drone mission duration in seconds
+SIM_MISSION_DURATION_S = 300
+
+# How long to busy-poll for a fast firmware reply before yielding to the event loop
+SERIAL_POLL_BUDGET_US = 500
+
+def _dumps(obj) -> str:
+    """Pretty-print a command response as JSON (datetimes as ISO strings)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(obj, indent=2, default=str)
+
+def _is_ok(resp: bytes) -> bool:
+    """Check a raw controller response for the firmware's OK acknowledgement"""
+    return resp.startswith(b"OK") or resp.startswith(b"ok")
+
+# Offset from the monotonic clock to wall-clock time, for formatting
+# monotonic timestamps only when they are reported
+_WALL_CLOCK_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+def _monotonic_to_datetime(ns: int) -> datetime:
+    """Convert a time.monotonic_ns() reading to a local datetime"""
+    return datetime.fromtimestamp((ns + _WALL_CLOCK_OFFSET_NS) / 1e9)
+
 class ValveState(Enum):
     """Valve state enumeration"""
     OPEN = "0"
@@ -41,9 +79,49 @@ class ControllerStatus(Enum):
     ERROR = "error"
     DISCONNECTED = "disconnected"
 
+# Command validation sets and labels, built once at import
+_STR2VALVE = {s.value: s for s in ValveState}
+_STR2FILTER = {s.value: s for s in FilterPosition}
+_VALVE_ACTIONS = frozenset(s.value for s in (ValveState.OPEN, ValveState.CLOSED))
+_FILTER_ACTIONS = frozenset(s.value for s in (FilterPosition.FORWARD, FilterPosition.BACKWARD,
+                                              FilterPosition.ROTATE))
+_VALVE_ACTION_NAMES = {
+    '0': 'opened',
+    'C': 'closed'
+}
+_FILTER_ACTION_NAMES = {
+    'f': 'moved forward',
+    'b': 'moved backward',
+    'r': 'rotated'
+}
+
+# Simulated state changes: raw command -> (attribute, new state)
+_SIM_DISPATCH = {
+    ValveState.OPEN.value: ("valve_state", ValveState.OPEN),
+    ValveState.CLOSED.value: ("valve_state", ValveState.CLOSED),
+    FilterPosition.FORWARD.value: ("filter_position", FilterPosition.FORWARD),
+    FilterPosition.BACKWARD.value: ("filter_position", FilterPosition.BACKWARD),
+    FilterPosition.ROTATE.value: ("filter_position", FilterPosition.ROTATE)
+}
+
+# Wire encoding of the fixed command set, so sends don't re-encode each time
+_CMD_BYTES = {c: f"{c}\n".encode('utf-8') for c in ("0", "C", "f", "b", "r", "STOP", "STATUS")}
+
+def _encode_command(command: str) -> bytes:
+    """Newline-terminated bytes for a command (pre-encoded for known commands)"""
+    return _CMD_BYTES.get(command) or f"{command}\n".encode('utf-8')
+
 class HardwareController:
     """Main hardware controller for water filtration system"""
     
+    __slots__ = (
+        "serial_port", "baudrate", "timeout", "serial_connection", "status",
+        "valve_state", "filter_position", "_now_ns", "last_command_time_ns",
+        "command_history", "_rx_buf", "_serial_exec", "_io_lock",
+        "max_valve_operations_per_hour", "valve_operation_count", "valve_count_reset_ns",
+        "_sim_delay_s"
+    )
+    
     def __init__(self, 
                  serial_port: str = None,
                  baudrate: int = 9600,
@@ -58,13 +136,25 @@ class HardwareController:
         # System state
         self.valve_state = ValveState.UNKNOWN
         self.filter_position = FilterPosition.STOP
-        self.last_command_time = None
-        self.command_history = []
+        self._now_ns = time.monotonic_ns
+        self.last_command_time_ns: Optional[int] = None
+        self.command_history = deque(maxlen=COMMAND_HISTORY_SIZE)
+        
+        # Bytes read from the port but not yet consumed as a full line
+        self._rx_buf = bytearray()
+        
+        # Blocking serial calls (ports without a pollable fd) run on one worker
+        # thread; the lock keeps each command/response pair together
+        self._serial_exec: Optional[ThreadPoolExecutor] = None
+        self._io_lock = asyncio.Lock()
+        
+        # Artificial delay for simulated commands (set e.g. 0.1 for demos)
+        self._sim_delay_s = float(os.getenv("SIM_DELAY_S", "0"))
         
         # Safety settings
         self.max_valve_operations_per_hour = 100
         self.valve_operation_count = 0
-        self.valve_count_reset_time = datetime.now()
+        self.valve_count_reset_ns = self._now_ns()
         
     async def connect(self) -> bool:
         """Connect to hardware controller"""
@@ -74,10 +164,10 @@ class HardwareController:
                 baudrate=self.baudrate,
                 timeout=self.timeout
             )
+            self._set_low_latency()
             
             # Test connection
-            await self._send_command("STATUS")
-            response = await self._read_response()
+            _, response = await self._exchange("STATUS")
             
             if response:
                 self.status = ControllerStatus.READY
@@ -91,12 +181,40 @@ class HardwareController:
             self.status = ControllerStatus.DISCONNECTED
             return False
     
+    def _set_low_latency(self):
+        """Disable the USB-serial adapter's receive buffering delay (FTDI default: 16 ms)"""
+        try:
+            # Linux: ASYNC_LOW_LATENCY via TIOCSSERIAL
+            self.serial_connection.set_low_latency_mode(True)
+            logger.info("Serial low-latency mode enabled")
+            return
+        except AttributeError:
+            logger.warning("Low-latency serial mode not supported on this platform; "
+                           "set the adapter latency timer to 1 ms in its driver settings")
+            return
+        except Exception as e:
+            logger.debug(f"TIOCSSERIAL low-latency failed: {e}")
+        
+        # Fallback for usb-serial drivers that ignore ASYNC_LOW_LATENCY
+        tty_name = os.path.basename(os.path.realpath(self.serial_port))
+        latency_timer = f"/sys/bus/usb-serial/devices/{tty_name}/latency_timer"
+        try:
+            with open(latency_timer, 'w') as f:
+                f.write("1")
+            logger.info(f"Serial latency timer set to 1 ms ({latency_timer})")
+        except OSError as e:
+            logger.warning(f"Could not enable low-latency serial mode: {e}")
+    
     def disconnect(self):
         """Disconnect from hardware controller"""
         if self.serial_connection and self.serial_connection.is_open:
             self.serial_connection.close()
             self.status = ControllerStatus.DISCONNECTED
             logger.info("Hardware controller disconnected")
+        
+        if self._serial_exec:
+            self._serial_exec.shutdown(wait=False)
+            self._serial_exec = None
     
     async def _send_command(self, command: str) -> bool:
         """Send command to hardware controller"""
@@ -105,77 +223,216 @@ class HardwareController:
                 # If no hardware connected, simulate for development
                 return await self._simulate_command(command)
             
-            command_bytes = f"{command}\n".encode('utf-8')
-            self.serial_connection.write(command_bytes)
-            self.last_command_time = datetime.now()
+            command_bytes = _encode_command(command)
+            await self._write_serial(command_bytes)
+            self.last_command_time_ns = self._now_ns()
             
             # Log command
             self.command_history.append({
                 'command': command,
-                'timestamp': self.last_command_time,
+                'timestamp_ns': self.last_command_time_ns,
                 'simulated': False
             })
             
-            logger.info(f"Command sent: {command}")
+            logger.info("Command sent: %s", command)
             return True
             
         except Exception as e:
             logger.error(f"Error sending command {command}: {e}")
             return False
     
-    async def _read_response(self, timeout: float = None) -> Optional[str]:
-        """Read response from hardware controller"""
+    async def _send_batch(self, commands: List[str]) -> bool:
+        """Send several commands back-to-back in a single serial write"""
         try:
             if not self.serial_connection or not self.serial_connection.is_open:
-                # Simulate response for development
-                await asyncio.sleep(0.1)
-                return "OK"
+                for command in commands:
+                    await self._simulate_command(command)
+                return True
             
-            # Set timeout
-            original_timeout = self.serial_connection.timeout
-            if timeout:
-                self.serial_connection.timeout = timeout
+            await self._write_serial(b"".join(_encode_command(command) for command in commands))
+            self.last_command_time_ns = self._now_ns()
             
-            response = self.serial_connection.readline().decode('utf-8').strip()
+            for command in commands:
+                self.command_history.append({
+                    'command': command,
+                    'timestamp_ns': self.last_command_time_ns,
+                    'simulated': False
+                })
             
-            # Restore original timeout
-            self.serial_connection.timeout = original_timeout
+            logger.info("Commands sent: %s", commands)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error sending commands {commands}: {e}")
+            return False
+    
+    async def _exchange(self, command: str, timeout: float = None,
+                        raw: bool = False) -> Tuple[bool, Optional[Union[str, bytes]]]:
+        """Send a command and read its response without interleaving other commands"""
+        async with self._io_lock:
+            success = await self._send_command(command)
+            response = await self._read_response(timeout=timeout, raw=raw) if success else None
+            return success, response
+    
+    async def _read_response(self, timeout: float = None,
+                             raw: bool = False) -> Optional[Union[str, bytes]]:
+        """Read response from hardware controller (undecoded bytes if raw=True)"""
+        try:
+            if not self.serial_connection or not self.serial_connection.is_open:
+                # Simulate response for development
+                if self._sim_delay_s:
+                    await asyncio.sleep(self._sim_delay_s)
+                return b"OK" if raw else "OK"
+            
+            line = await self._readline_serial(timeout)
             
-            logger.debug(f"Response received: {response}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Response received: %r", line)
+            if raw:
+                return line if line.strip() else None
+            
+            response = line.decode('utf-8').strip()
             return response if response else None
             
         except Exception as e:
             logger.error(f"Error reading response: {e}")
             return None
     
+    def _serial_fd(self) -> Optional[int]:
+        """File descriptor for event-loop driven I/O, or None where unsupported (Windows)"""
+        try:
+            return self.serial_connection.fileno()
+        except (AttributeError, OSError, ValueError):
+            return None
+    
+    async def _wait_fd(self, fd: int, add, remove, timeout: Optional[float]) -> bool:
+        """Wait until the loop reports the fd ready; False on timeout"""
+        ready = asyncio.get_running_loop().create_future()
+        add(fd, lambda: ready.done() or ready.set_result(None))
+        try:
+            await asyncio.wait_for(ready, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            remove(fd)
+    
+    async def _run_blocking(self, func, *args):
+        """Run a blocking serial call on the dedicated serial I/O thread"""
+        if self._serial_exec is None:
+            self._serial_exec = ThreadPoolExecutor(max_workers=1, thread_name_prefix="serial-io")
+        return await asyncio.get_running_loop().run_in_executor(self._serial_exec, func, *args)
+    
+    async def _write_serial(self, data: bytes):
+        """Write to the serial port without blocking the event loop"""
+        fd = self._serial_fd()
+        if fd is None:
+            await self._run_blocking(self.serial_connection.write, data)
+            return
+        
+        loop = asyncio.get_running_loop()
+        view = memoryview(data)
+        while view:
+            try:
+                written = os.write(fd, view)
+            except BlockingIOError:
+                written = 0
+            view = view[written:]
+            if view:
+                await self._wait_fd(fd, loop.add_writer, loop.remove_writer, None)
+    
+    async def _await_bytes(self, n_min: int = 1, budget_us: int = SERIAL_POLL_BUDGET_US) -> bool:
+        """Spin on the driver's input count for a short budget; True if n_min bytes are waiting"""
+        deadline = time.monotonic_ns() + budget_us * 1000
+        while self.serial_connection.in_waiting < n_min:
+            if time.monotonic_ns() >= deadline:
+                # Budget spent: give the loop a turn and report what arrived meanwhile
+                await asyncio.sleep(0)
+                return self.serial_connection.in_waiting >= n_min
+        return True
+    
+    async def _readline_serial(self, timeout: float = None) -> bytes:
+        """Read one newline-terminated message without blocking the event loop"""
+        # Fast replies are usually buffered within microseconds; take them
+        # directly instead of paying for a reader registration or executor hop
+        if b'\n' not in self._rx_buf and await self._await_bytes():
+            self._rx_buf += self.serial_connection.read(self.serial_connection.in_waiting)
+        if b'\n' in self._rx_buf:
+            return self._pop_line()
+        
+        fd = self._serial_fd()
+        if fd is None:
+            return await self._run_blocking(self._blocking_readline, timeout)
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        
+        while b'\n' not in self._rx_buf:
+            remaining = deadline - loop.time()
+            if remaining <= 0 or not await self._wait_fd(fd, loop.add_reader, loop.remove_reader, remaining):
+                break
+            try:
+                chunk = os.read(fd, 4096)
+            except BlockingIOError:
+                continue
+            if not chunk:
+                break
+            self._rx_buf += chunk
+        
+        return self._pop_line()
+    
+    def _pop_line(self) -> bytes:
+        """Take the first line (or whatever arrived before a timeout) off the receive buffer"""
+        line, _, rest = self._rx_buf.partition(b'\n')
+        self._rx_buf = bytearray(rest)
+        return bytes(line)
+    
+    def _blocking_readline(self, timeout: float = None) -> bytes:
+        """Bulk-read everything waiting until a full line arrives (runs on the serial I/O thread)"""
+        # Set timeout
+        original_timeout = self.serial_connection.timeout
+        if timeout:
+            self.serial_connection.timeout = timeout
+        
+        deadline = time.monotonic() + (timeout or self.timeout)
+        try:
+            while b'\n' not in self._rx_buf and time.monotonic() < deadline:
+                # Read all pending bytes in one call instead of readline()'s byte-at-a-time loop
+                chunk = self.serial_connection.read(self.serial_connection.in_waiting or 1)
+                if not chunk:
+                    break
+                self._rx_buf += chunk
+        finally:
+            # Restore original timeout
+            self.serial_connection.timeout = original_timeout
+        
+        return self._pop_line()
+    
     async def _simulate_command(self, command: str) -> bool:
         """Simulate command execution for development/testing"""
-        await asyncio.sleep(0.1)  # Simulate processing delay
+        if self._sim_delay_s:
+            await asyncio.sleep(self._sim_delay_s)  # Simulate processing delay
         
         # Log simulated command
         self.command_history.append({
             'command': command,
-            'timestamp': datetime.now(),
+            'timestamp_ns': self._now_ns(),
             'simulated': True
         })
         
         # Update simulated state
-        if command == ValveState.OPEN.value:
-            self.valve_state = ValveState.OPEN
-        elif command == ValveState.CLOSED.value:
-            self.valve_state = ValveState.CLOSED
-        elif command in [FilterPosition.FORWARD.value, FilterPosition.BACKWARD.value, 
-                        FilterPosition.ROTATE.value]:
-            self.filter_position = FilterPosition(command)
-        
-        logger.info(f"Simulated command: {command}")
+        hit = _SIM_DISPATCH.get(command)
+        if hit:
+            setattr(self, hit[0], hit[1])
+        
+        logger.info("Simulated command: %s", command)
         return True
     
     async def control_valve(self, action: str) -> Dict:
         """Control water valve (open/close)"""
         
         # Validate action
-        if action not in [ValveState.OPEN.value, ValveState.CLOSED.value]:
+        if action not in _VALVE_ACTIONS:
             return {
                 "success": False,
                 "error": f"Invalid valve action: {action}. Use '0' (open) or 'C' (close)"
@@ -191,23 +448,20 @@ class HardwareController:
         try:
             self.status = ControllerStatus.BUSY
             
-            # Send command
-            success = await self._send_command(action)
+            # Send command and wait for response
+            success, raw_resp = await self._exchange(action, timeout=5.0, raw=True)
             
             if success:
-                # Wait for response
-                response = await self._read_response(timeout=5.0)
-                
-                if response and "OK" in response.upper():
+                if raw_resp and _is_ok(raw_resp):
                     # Update state
-                    self.valve_state = ValveState(action)
+                    self.valve_state = _STR2VALVE[action]
                     self._increment_valve_count()
                     
                     self.status = ControllerStatus.READY
                     
                     return {
                         "success": True,
-                        "action": "opened" if action == "0" else "closed",
+                        "action": _VALVE_ACTION_NAMES[action],
                         "valve_state": self.valve_state.value,
                         "timestamp": datetime.now().isoformat()
                     }
@@ -230,10 +484,7 @@ class HardwareController:
         """Control filter system (rotate, move forward/backward)"""
         
         # Validate action
-        valid_actions = [FilterPosition.FORWARD.value, FilterPosition.BACKWARD.value, 
-                        FilterPosition.ROTATE.value]
-        
-        if action not in valid_actions:
+        if action not in _FILTER_ACTIONS:
             return {
                 "success": False,
                 "error": f"Invalid filter action: {action}. Use 'f' (forward), 'b' (backward), 'r' (rotate)"
@@ -242,27 +493,18 @@ class HardwareController:
         try:
             self.status = ControllerStatus.BUSY
             
-            # Send command
-            success = await self._send_command(action)
+            # Send command and wait longer for filter operations
+            success, raw_resp = await self._exchange(action, timeout=10.0, raw=True)
             
             if success:
-                # Filter operations take longer
-                response = await self._read_response(timeout=10.0)
-                
-                if response and "OK" in response.upper():
+                if raw_resp and _is_ok(raw_resp):
                     # Update state
-                    self.filter_position = FilterPosition(action)
+                    self.filter_position = _STR2FILTER[action]
                     self.status = ControllerStatus.READY
                     
-                    action_name = {
-                        'f': 'moved forward',
-                        'b': 'moved backward', 
-                        'r': 'rotated'
-                    }[action]
-                    
                     return {
                         "success": True,
-                        "action": action_name,
+                        "action": _FILTER_ACTION_NAMES[action],
                         "filter_position": self.filter_position.value,
                         "timestamp": datetime.now().isoformat()
                     }
@@ -286,13 +528,10 @@ class HardwareController:
         try:
             logger.warning("Emergency stop activated")
             
-            # Send emergency stop command
-            success = await self._send_command("STOP")
+            # Send emergency stop and close the valve for safety in one write
+            success = await self._send_batch(["STOP", ValveState.CLOSED.value])
             
             if success:
-                # Close valve for safety
-                await self._send_command(ValveState.CLOSED.value)
-                
                 self.valve_state = ValveState.CLOSED
                 self.filter_position = FilterPosition.STOP
                 self.status = ControllerStatus.READY
@@ -323,17 +562,33 @@ class HardwareController:
             "last_command_time": self.last_command_time.isoformat() if self.last_command_time else None,
             "valve_operations_today": self.valve_operation_count,
             "connected": self.serial_connection and self.serial_connection.is_open if self.serial_connection else False,
-            "recent_commands": self.command_history[-5:] if self.command_history else []
+            "recent_commands": [
+                {
+                    'command': entry['command'],
+                    'timestamp': _monotonic_to_datetime(entry['timestamp_ns']),
+                    'simulated': entry['simulated']
+                }
+                for entry in itertools.islice(
+                    self.command_history, max(0, len(self.command_history) - 5), None
+                )
+            ]
         }
     
+    @property
+    def last_command_time(self) -> Optional[datetime]:
+        """Wall-clock time of the last hardware command (converted on demand)"""
+        if self.last_command_time_ns is None:
+            return None
+        return _monotonic_to_datetime(self.last_command_time_ns)
+    
     def _check_valve_safety_limits(self) -> bool:
         """Check if valve operation is within safety limits"""
-        now = datetime.now()
+        now_ns = self._now_ns()
         
         # Reset counter if an hour has passed
-        if (now - self.valve_count_reset_time).total_seconds() > 3600:
+        if now_ns - self.valve_count_reset_ns > 3_600_000_000_000:
             self.valve_operation_count = 0
-            self.valve_count_reset_time = now
+            self.valve_count_reset_ns = now_ns
         
         return self.valve_operation_count < self.max_valve_operations_per_hour
     
@@ -344,10 +599,24 @@ class HardwareController:
 class DroneController:
     """Controller for drone dispatch and coordination"""
     
+    __slots__ = ("active_missions", "drone_status", "mission_counter",
+                 "_dispatched_count", "_recent_missions", "_completion_heap",
+                 "_completion_event", "_completion_task", "state_version")
+    
     def __init__(self):
-        self.active_missions = {}
+        self.active_missions = OrderedDict()
+        self._dispatched_count = 0
+        self._recent_missions = deque(maxlen=5)
         self.drone_status = "available"  # available, dispatched, maintenance
         self.mission_counter = 0
+        
+        # Bumped on every mission state change so callers can cache status views
+        self.state_version = 0
+        
+        # Simulated completions: (due monotonic time, mission id) served by one timer task
+        self._completion_heap: List[Tuple[float, str]] = []
+        self._completion_event = asyncio.Event()
+        self._completion_task: Optional[asyncio.Task] = None
     
     async def dispatch_drone(self, latitude: float, longitude: float, 
                            mission_type: str = "delivery") -> Dict:
@@ -371,24 +640,29 @@ class DroneController:
             mission_id = f"mission_{self.mission_counter}_{int(time.time())}"
             
             # Create mission
+            now = datetime.now()
             mission = {
                 "id": mission_id,
                 "type": mission_type,
                 "latitude": latitude,
                 "longitude": longitude,
                 "status": "dispatched",
-                "dispatch_time": datetime.now(),
-                "estimated_arrival": datetime.now().replace(minute=datetime.now().minute + 15)  # 15 min estimate
+                "dispatch_time": now,
+                "estimated_arrival": now + timedelta(minutes=15)  # 15 min estimate
             }
             
             self.active_missions[mission_id] = mission
+            self._evict_old_missions()
+            self._dispatched_count += 1
+            self._recent_missions.append(mission)
             self.drone_status = "dispatched"
+            self.state_version += 1
             
             # In a real implementation, this would interface with drone API
-            logger.info(f"Drone dispatched to {latitude}, {longitude} for {mission_type}")
+            logger.info("Drone dispatched to %s, %s for %s", latitude, longitude, mission_type)
             
             # Simulate mission completion after some time
-            asyncio.create_task(self._simulate_mission_completion(mission_id))
+            self._schedule_completion(mission_id)
             
             return {
                 "success": True,
@@ -405,27 +679,68 @@ class DroneController:
                 "error": str(e)
             }
     
-    async def _simulate_mission_completion(self, mission_id: str):
-        """Simulate mission completion (for development)"""
-        # Wait for simulated mission duration (5-15 minutes)
-        await asyncio.sleep(300)  # 5 minutes for simulation
+    def _evict_old_missions(self):
+        """Drop the oldest finished missions once more than MAX_TRACKED_MISSIONS are held"""
+        for _ in range(len(self.active_missions)):
+            if len(self.active_missions) <= MAX_TRACKED_MISSIONS:
+                break
+            oldest_id = next(iter(self.active_missions))
+            if self.active_missions[oldest_id]["status"] == "dispatched":
+                # Keep in-flight missions; look at the next oldest instead
+                self.active_missions.move_to_end(oldest_id)
+            else:
+                self.active_missions.popitem(last=False)
+    
+    def _schedule_completion(self, mission_id: str):
+        """Queue a simulated completion on the shared timer (for development)"""
+        heapq.heappush(self._completion_heap, (time.monotonic() + SIM_MISSION_DURATION_S, mission_id))
+        self._completion_event.set()
         
+        if self._completion_task is None or self._completion_task.done():
+            self._completion_task = asyncio.create_task(self._completion_loop())
+    
+    async def _completion_loop(self):
+        """Complete simulated missions in due order, sleeping until the next one"""
+        while True:
+            self._completion_event.clear()
+            if not self._completion_heap:
+                await self._completion_event.wait()
+                continue
+            
+            due, mission_id = self._completion_heap[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                # Wake early if an earlier completion gets scheduled meanwhile
+                try:
+                    await asyncio.wait_for(self._completion_event.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            heapq.heappop(self._completion_heap)
+            self._complete_mission(mission_id)
+    
+    def _complete_mission(self, mission_id: str):
+        """Mark a simulated mission completed and free the drone"""
         if mission_id in self.active_missions:
             self.active_missions[mission_id]["status"] = "completed"
+            self._dispatched_count -= 1
             self.active_missions[mission_id]["completion_time"] = datetime.now()
             self.drone_status = "available"
+            self.state_version += 1
             
-            logger.info(f"Mission {mission_id} completed")
+            logger.info("Mission %s completed", mission_id)
     
     def get_mission_status(self, mission_id: str) -> Dict:
         """Get status of specific mission"""
-        if mission_id not in self.active_missions:
+        mission = self.active_missions.get(mission_id)
+        if mission is None:
             return {
                 "success": False,
                 "error": "Mission not found"
             }
         
-        mission = self.active_missions[mission_id]
+        completion_time = mission.get("completion_time")
         return {
             "success": True,
             "mission": {
@@ -438,7 +753,7 @@ class DroneController:
                 },
                 "dispatch_time": mission["dispatch_time"].isoformat(),
                 "estimated_arrival": mission["estimated_arrival"].isoformat(),
-                "completion_time": mission.get("completion_time", {}).isoformat() if mission.get("completion_time") else None
+                "completion_time": completion_time.isoformat() if completion_time else None
             }
         }
     
@@ -446,9 +761,9 @@ class DroneController:
         """Get current drone status"""
         return {
             "status": self.drone_status,
-            "active_missions": len([m for m in self.active_missions.values() if m["status"] == "dispatched"]),
+            "active_missions": self._dispatched_count,
             "total_missions": self.mission_counter,
-            "recent_missions": list(self.active_missions.values())[-5:]  # Last 5 missions
+            "recent_missions": list(self._recent_missions)  # Last 5 missions
         }
 
 # Global controller instances
@@ -485,6 +800,10 @@ async def shutdown_controllers():
     # Disconnect hardware
     hardware_controller.disconnect()
     
+    # Stop the simulated mission timer
+    if drone_controller._completion_task:
+        drone_controller._completion_task.cancel()
+    
     logger.info("Controllers shutdown complete")
 
 # Command processing functions for IoT integration
@@ -521,28 +840,28 @@ async def main():
     
     # Initialize controllers
     init_results = await initialize_controllers()
-    print(f"Initialization results: {json.dumps(init_results, indent=2)}")
+    print(f"Initialization results: {_dumps(init_results)}")
     
     # Test valve control
     valve_result = await hardware_controller.control_valve("0")  # Open
-    print(f"Valve open result: {json.dumps(valve_result, indent=2, default=str)}")
+    print(f"Valve open result: {_dumps(valve_result)}")
     
     await asyncio.sleep(2)
     
     valve_result = await hardware_controller.control_valve("C")  # Close
-    print(f"Valve close result: {json.dumps(valve_result, indent=2, default=str)}")
+    print(f"Valve close result: {_dumps(valve_result)}")
     
     # Test filter control
     filter_result = await hardware_controller.control_filter("r")  # Rotate
-    print(f"Filter rotate result: {json.dumps(filter_result, indent=2, default=str)}")
+    print(f"Filter rotate result: {_dumps(filter_result)}")
     
     # Test drone dispatch
     drone_result = await drone_controller.dispatch_drone(40.7128, -74.0060, "emergency_supply")
-    print(f"Drone dispatch result: {json.dumps(drone_result, indent=2, default=str)}")
+    print(f"Drone dispatch result: {_dumps(drone_result)}")
     
     # Get status
     status = hardware_controller.get_status()
-    print(f"Hardware status: {json.dumps(status, indent=2, default=str)}")
+    print(f"Hardware status: {_dumps(status)}")
     
     # Shutdown
     await shutdown_controllers()
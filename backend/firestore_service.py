@@ -6,15 +6,26 @@ Handles all database operations with Firebase Firestore
 import os
 import json
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+import functools
+import hashlib
+import heapq
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Any, AsyncIterator, Tuple
 from dataclasses import asdict
 import asyncio
+import numpy as np
 
 try:
     import firebase_admin
     from firebase_admin import credentials, firestore
+    from google.api_core.retry import Retry
     FIREBASE_AVAILABLE = True
+    
+    # Exponential backoff for transient errors on batch commits
+    COMMIT_RETRY = Retry(initial=0.5, maximum=8.0, multiplier=2.0, timeout=30.0)
 except ImportError:
     FIREBASE_AVAILABLE = False
     print("Firebase Admin SDK not available. Install with: pip install firebase-admin")
@@ -25,14 +36,67 @@ from sensors import SensorReading
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Sensor readings are queued and committed together: at most this many per
+# WriteBatch (headroom under Firestore's 500-mutation limit), at least this often
+SENSOR_BATCH_MAX = 450
+SENSOR_FLUSH_INTERVAL = 0.2
+
+# Shared default for writes without metadata. Never mutated; a plain dict because
+# the Firestore encoder only accepts dict instances (not MappingProxyType)
+_NO_METADATA: Dict = {}
+
+# Quality status indexed by (poor << 1) | fair
+_QUALITY_LABELS = ('excellent', 'fair', 'poor', 'poor')
+
+# Query results are pulled from the stream this many documents at a time
+STREAM_CHUNK_SIZE = 100
+
+# How long a fetched system_config stays valid without a live listener (seconds)
+SYSTEM_CONFIG_TTL = 30.0
+
+# Sensor readings can be spread over this many collections (sensor_readings_<n>),
+# keyed by user and hour, so writes don't pile onto one hot key range; 1 keeps
+# everything in sensor_readings (the frontend only reads that collection)
+SENSOR_SHARDS = max(1, min(256, int(os.getenv('FIRESTORE_SENSOR_SHARDS', 1))))
+
+# Upper bound on documents removed by one cleanup_old_data() run
+CLEANUP_MAX_DELETES = 50000
+
+# Bulk saves are split into mini-batches this size and committed concurrently
+BULK_CHUNK_SIZE = 50
+
 class FirestoreService:
-    """Service for handling Firestore database operations"""
+    """Service for handling Firestore database operations
+    
+    Writes are blind (no read-before-write), so each save is a single RPC;
+    any de-duplication has to happen on the caller's side.
+    """
     
     def __init__(self, project_id: str = "aquasentinel-8b5e9"):
         self.project_id = project_id
         self.db = None
         self.initialized = False
         
+        # Clients (one gRPC channel each) handed out round-robin per request
+        self._clients = []
+        self._rr = None
+        
+        # firebase_admin calls block on network round trips; run them on a
+        # dedicated pool so concurrent requests overlap instead of stalling the loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('FIRESTORE_WORKERS', 20)),
+            thread_name_prefix="firestore"
+        )
+        
+        # Pending (document ref, data) sensor writes, drained by a background task
+        # started on first use (the global instance is created before any loop runs)
+        self._pending: Optional[asyncio.Queue] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        
+        # (fetched at, config) kept fresh by a snapshot listener once one is attached
+        self._config_cache: Optional[Tuple[float, Dict]] = None
+        self._config_watch = None
+        
         # Collection names
         self.collections = {
             'sensor_readings': 'sensor_readings',
@@ -71,6 +135,17 @@ class FirestoreService:
                     logger.info("Firebase initialized with default credentials")
             
             self.db = firestore.client()
+            
+            # Extra clients with their own channels, so concurrent requests
+            # aren't limited by a single HTTP/2 connection's stream budget
+            app = firebase_admin.get_app()
+            pool_size = max(1, int(os.getenv('FIRESTORE_CLIENT_POOL', 4)))
+            self._clients = [self.db] + [
+                firestore.Client(project=app.project_id or self.project_id,
+                                 credentials=app.credential.get_credential())
+                for _ in range(pool_size - 1)
+            ]
+            self._rr = itertools.cycle(self._clients)
             self.initialized = True
             logger.info("Firestore service initialized successfully")
             
@@ -79,39 +154,91 @@ class FirestoreService:
             self.db = None
             self.initialized = False
     
+    def _client(self):
+        """Next Firestore client from the pool"""
+        return next(self._rr)
+    
+    def _run(self, fn, *args):
+        """Run a blocking Firestore call on the service's thread pool"""
+        return asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(fn, *args)
+        )
+    
+    async def _iter_docs(self, query) -> AsyncIterator[Any]:
+        """Yield query snapshots lazily, fetching each chunk of the stream off the event loop"""
+        stream = query.stream()
+        while True:
+            docs = await self._run(list, itertools.islice(stream, STREAM_CHUNK_SIZE))
+            if not docs:
+                return
+            for doc in docs:
+                yield doc
+    
+    async def _add(self, collection: str, data: Dict) -> str:
+        """Write a new document under a client-generated ID and return the ID"""
+        # Unlike collection.add(), the ID is known before the write, with no allocation round trip
+        doc_ref = self._client().collection(self.collections[collection]).document()
+        await self._run(doc_ref.set, data)
+        return doc_ref.id
+    
     def _get_timestamp(self) -> datetime:
-        """Get current timestamp"""
-        return datetime.now()
+        """Get current timestamp (timezone-aware, stored by Firestore as a native Timestamp)"""
+        return datetime.now(timezone.utc)
     
-    def _prepare_sensor_data(self, reading: SensorReading, user_id: str = "system") -> Dict:
+    def _prepare_sensor_data(self, reading: SensorReading, user_id: str = "system",
+                             quality_status: str = None) -> Dict:
         """Prepare sensor reading data for Firestore"""
         data = asdict(reading)
         data.update({
             'userId': user_id,
             'timestamp': firestore.SERVER_TIMESTAMP if self.db else self._get_timestamp(),
-            'createdAt': reading.timestamp.isoformat(),
-            'quality_status': self._determine_quality_status(reading)
+            'createdAt': reading.timestamp.astimezone(timezone.utc),
+            'quality_status': quality_status or self._determine_quality_status(reading)
         })
         return data
     
     def _determine_quality_status(self, reading: SensorReading) -> str:
         """Determine water quality status based on sensor readings"""
-        if reading.ph < 6.5 or reading.ph > 8.5:
-            return 'poor'
-        elif reading.tds > 500:
-            return 'poor'
-        elif reading.turbidity > 4:
-            return 'poor'
-        elif reading.ph < 7.0 or reading.ph > 8.0:
-            return 'fair'
-        elif reading.tds > 300:
-            return 'fair'
-        elif reading.turbidity > 1:
-            return 'fair'
-        else:
-            return 'excellent'
+        ph, tds, turbidity = reading.ph, reading.tds, reading.turbidity
+        poor = (ph < 6.5) | (ph > 8.5) | (tds > 500) | (turbidity > 4)
+        fair = (ph < 7.0) | (ph > 8.0) | (tds > 300) | (turbidity > 1)
+        return _QUALITY_LABELS[(poor << 1) | fair]
+    
+    def _determine_quality_statuses(self, readings: List[SensorReading]) -> List[str]:
+        """Vectorized _determine_quality_status for a batch of readings"""
+        count = len(readings)
+        ph = np.fromiter((r.ph for r in readings), dtype=np.float64, count=count)
+        tds = np.fromiter((r.tds for r in readings), dtype=np.float64, count=count)
+        turbidity = np.fromiter((r.turbidity for r in readings), dtype=np.float64, count=count)
+        
+        poor = (ph < 6.5) | (ph > 8.5) | (tds > 500) | (turbidity > 4)
+        fair = (ph < 7.0) | (ph > 8.0) | (tds > 300) | (turbidity > 1)
+        index = (poor.astype(np.intp) << 1) | fair
+        return [_QUALITY_LABELS[i] for i in index.tolist()]
     
     # SENSOR READINGS
+    def _sensor_collection_name(self, user_id: str, ts: datetime) -> str:
+        """Collection (shard) a sensor reading is written to"""
+        base = self.collections['sensor_readings']
+        if SENSOR_SHARDS == 1:
+            return base
+        
+        digest = hashlib.blake2b(f"{user_id}{ts.hour}".encode(), digest_size=1).digest()
+        return f"{base}_{digest[0] % SENSOR_SHARDS}"
+    
+    def _sensor_collection_names(self) -> List[str]:
+        """Every collection that may hold sensor readings"""
+        base = self.collections['sensor_readings']
+        if SENSOR_SHARDS == 1:
+            return [base]
+        return [f"{base}_{shard}" for shard in range(SENSOR_SHARDS)]
+    
+    async def _fetch_shards(self, queries: List[Any], limit: int) -> List[Any]:
+        """Run one query per shard concurrently and merge the results newest-first"""
+        shard_docs = await asyncio.gather(*(self._run(list, query.stream()) for query in queries))
+        merged = heapq.merge(*shard_docs, key=lambda doc: doc.get('createdAt'), reverse=True)
+        return list(itertools.islice(merged, limit))
+    
     async def save_sensor_reading(self, reading: SensorReading, user_id: str = "system") -> Optional[str]:
         """Save sensor reading to Firestore"""
         if not self.initialized:
@@ -120,17 +247,108 @@ class FirestoreService:
         
         try:
             data = self._prepare_sensor_data(reading, user_id)
-            doc_ref = self.db.collection(self.collections['sensor_readings']).add(data)
+            # Client-generated ID, so the reading can be acknowledged before the batch commits
+            collection = self._sensor_collection_name(user_id, reading.timestamp)
+            doc_ref = self._client().collection(collection).document()
             
-            # doc_ref is a tuple (timestamp, document_reference)
-            doc_id = doc_ref[1].id
-            logger.info(f"Sensor reading saved with ID: {doc_id}")
-            return doc_id
+            self._ensure_flush_task()
+            await self._pending.put((doc_ref, data))
+            return doc_ref.id
             
         except Exception as e:
             logger.error(f"Error saving sensor reading: {e}")
             return None
     
+    def _ensure_flush_task(self):
+        """Start the background sensor batch writer if it is not running"""
+        if self._pending is None:
+            self._pending = asyncio.Queue()
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+    
+    async def _flush_loop(self):
+        """Commit queued sensor readings in batches of up to SENSOR_BATCH_MAX until flush() stops it"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._pending.get()
+            if item is None:
+                return
+            
+            items = [item]
+            deadline = loop.time() + SENSOR_FLUSH_INTERVAL
+            
+            while len(items) < SENSOR_BATCH_MAX:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._pending.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    # Stop requested: commit what is held, then exit
+                    stopping = True
+                    break
+                items.append(item)
+            
+            await self._commit_sensor_batch(items)
+    
+    async def _commit_sensor_batch(self, items: List[tuple]):
+        """Write a group of queued sensor readings in one WriteBatch"""
+        try:
+            batch = self._client().batch()
+            for doc_ref, data in items:
+                batch.set(doc_ref, data)
+            
+            await self._run(batch.commit)
+            logger.info(f"Committed {len(items)} queued sensor readings")
+            
+        except Exception as e:
+            logger.error(f"Error committing {len(items)} queued sensor readings: {e}")
+    
+    async def flush(self):
+        """Commit any queued sensor readings now (called by shutdown())"""
+        task, self._flush_task = self._flush_task, None
+        if task is not None and not task.done():
+            # None is the stop sentinel; the loop commits the batch it holds before exiting
+            await self._pending.put(None)
+            await task
+        
+        # Readings queued behind the sentinel
+        items = []
+        while self._pending is not None and not self._pending.empty():
+            item = self._pending.get_nowait()
+            if item is not None:
+                items.append(item)
+        
+        for start in range(0, len(items), SENSOR_BATCH_MAX):
+            await self._commit_sensor_batch(items[start:start + SENSOR_BATCH_MAX])
+    
+    async def iter_sensor_readings(self, hours: int = 24, limit: int = 100,
+                                   user_id: str = "system") -> AsyncIterator[Dict]:
+        """Yield sensor readings from Firestore one document at a time"""
+        if not self.initialized:
+            return
+        
+        hours_ago = self._get_timestamp() - timedelta(hours=hours)
+        client = self._client()
+        
+        queries = [(client.collection(name)
+                   .where('userId', '==', user_id)
+                   .where('createdAt', '>=', hours_ago)
+                   .order_by('createdAt', direction=firestore.Query.DESCENDING)
+                   .limit(limit))
+                   for name in self._sensor_collection_names()]
+        
+        if len(queries) == 1:
+            async for doc in self._iter_docs(queries[0]):
+                yield {**doc.to_dict(), 'id': doc.id}
+            return
+        
+        for doc in await self._fetch_shards(queries, limit):
+            yield {**doc.to_dict(), 'id': doc.id}
+    
     async def get_sensor_readings(self, hours: int = 24, limit: int = 100, user_id: str = "system") -> List[Dict]:
         """Get sensor readings from Firestore"""
         if not self.initialized:
@@ -138,21 +356,7 @@ class FirestoreService:
             return []
         
         try:
-            hours_ago = datetime.now() - timedelta(hours=hours)
-            
-            query = (self.db.collection(self.collections['sensor_readings'])
-                    .where('userId', '==', user_id)
-                    .where('createdAt', '>=', hours_ago.isoformat())
-                    .order_by('createdAt', direction=firestore.Query.DESCENDING)
-                    .limit(limit))
-            
-            docs = query.stream()
-            readings = []
-            
-            for doc in docs:
-                data = doc.to_dict()
-                data['id'] = doc.id
-                readings.append(data)
+            readings = [reading async for reading in self.iter_sensor_readings(hours, limit, user_id)]
             
             logger.info(f"Retrieved {len(readings)} sensor readings")
             return readings
@@ -161,18 +365,31 @@ class FirestoreService:
             logger.error(f"Error getting sensor readings: {e}")
             return []
     
-    async def get_latest_sensor_reading(self, user_id: str = "system") -> Optional[Dict]:
-        """Get the latest sensor reading"""
+    async def get_latest_sensor_reading(self, user_id: str = "system",
+                                        fields: List[str] = None) -> Optional[Dict]:
+        """Get the latest sensor reading (only the given fields, if any)"""
         if not self.initialized:
             return None
         
         try:
-            query = (self.db.collection(self.collections['sensor_readings'])
-                    .where('userId', '==', user_id)
-                    .order_by('createdAt', direction=firestore.Query.DESCENDING)
-                    .limit(1))
-            
-            docs = list(query.stream())
+            client = self._client()
+            queries = []
+            for name in self._sensor_collection_names():
+                query = (client.collection(name)
+                        .where('userId', '==', user_id)
+                        .order_by('createdAt', direction=firestore.Query.DESCENDING)
+                        .limit(1))
+                
+                if fields:
+                    # Projection: only the requested fields come back over the wire
+                    # (plus createdAt, which merging across shards compares on)
+                    query = query.select(fields if SENSOR_SHARDS == 1 else list({*fields, 'createdAt'}))
+                queries.append(query)
+            
+            if len(queries) == 1:
+                docs = await self._run(list, queries[0].stream())
+            else:
+                docs = await self._fetch_shards(queries, 1)
             if docs:
                 data = docs[0].to_dict()
                 data['id'] = docs[0].id
@@ -199,14 +416,13 @@ class FirestoreService:
                 'severity': severity,
                 'userId': user_id,
                 'timestamp': firestore.SERVER_TIMESTAMP,
-                'createdAt': self._get_timestamp().isoformat(),
+                'createdAt': self._get_timestamp(),
                 'isRead': False,
                 'isResolved': False,
-                'metadata': metadata or {}
+                'metadata': metadata if metadata else _NO_METADATA
             }
             
-            doc_ref = self.db.collection(self.collections['alerts']).add(data)
-            doc_id = doc_ref[1].id
+            doc_id = await self._add('alerts', data)
             logger.info(f"Alert saved with ID: {doc_id}")
             return doc_id
             
@@ -214,6 +430,23 @@ class FirestoreService:
             logger.error(f"Error saving alert: {e}")
             return None
     
+    async def iter_alerts(self, limit: int = 50, user_id: str = "system",
+                          unresolved_only: bool = False) -> AsyncIterator[Dict]:
+        """Yield alerts from Firestore one document at a time"""
+        if not self.initialized:
+            return
+        
+        query = (self._client().collection(self.collections['alerts'])
+                .where('userId', '==', user_id)
+                .order_by('createdAt', direction=firestore.Query.DESCENDING)
+                .limit(limit))
+        
+        if unresolved_only:
+            query = query.where('isResolved', '==', False)
+        
+        async for doc in self._iter_docs(query):
+            yield {**doc.to_dict(), 'id': doc.id}
+    
     async def get_alerts(self, limit: int = 50, user_id: str = "system", 
                         unresolved_only: bool = False) -> List[Dict]:
         """Get alerts from Firestore"""
@@ -221,23 +454,7 @@ class FirestoreService:
             return []
         
         try:
-            query = (self.db.collection(self.collections['alerts'])
-                    .where('userId', '==', user_id)
-                    .order_by('createdAt', direction=firestore.Query.DESCENDING)
-                    .limit(limit))
-            
-            if unresolved_only:
-                query = query.where('isResolved', '==', False)
-            
-            docs = query.stream()
-            alerts = []
-            
-            for doc in docs:
-                data = doc.to_dict()
-                data['id'] = doc.id
-                alerts.append(data)
-            
-            return alerts
+            return [alert async for alert in self.iter_alerts(limit, user_id, unresolved_only)]
             
         except Exception as e:
             logger.error(f"Error getting alerts: {e}")
@@ -257,12 +474,11 @@ class FirestoreService:
                 'status': status,
                 'userId': user_id,
                 'timestamp': firestore.SERVER_TIMESTAMP,
-                'createdAt': self._get_timestamp().isoformat(),
-                'metadata': metadata or {}
+                'createdAt': self._get_timestamp(),
+                'metadata': metadata if metadata else _NO_METADATA
             }
             
-            doc_ref = self.db.collection(self.collections['control_actions']).add(data)
-            doc_id = doc_ref[1].id
+            doc_id = await self._add('control_actions', data)
             logger.info(f"Control action saved with ID: {doc_id}")
             return doc_id
             
@@ -281,11 +497,10 @@ class FirestoreService:
                 **analysis_data,
                 'userId': user_id,
                 'timestamp': firestore.SERVER_TIMESTAMP,
-                'createdAt': self._get_timestamp().isoformat()
+                'createdAt': self._get_timestamp()
             }
             
-            doc_ref = self.db.collection(self.collections['ml_analysis']).add(data)
-            doc_id = doc_ref[1].id
+            doc_id = await self._add('ml_analysis', data)
             logger.info(f"ML analysis saved with ID: {doc_id}")
             return doc_id
             
@@ -299,31 +514,49 @@ class FirestoreService:
         if not self.initialized:
             return {}
         
+        cached = self._config_cache
+        if cached and (self._config_watch or time.monotonic() - cached[0] < SYSTEM_CONFIG_TTL):
+            return cached[1]
+        
         try:
-            docs = self.db.collection(self.collections['system_config']).stream()
-            config = {}
-            
-            for doc in docs:
-                config[doc.id] = doc.to_dict()
-            
+            query = self._client().collection(self.collections['system_config'])
+            config = {doc.id: doc.to_dict() async for doc in self._iter_docs(query)}
+            self._config_cache = (time.monotonic(), config)
+            self._watch_system_config(query)
             return config
             
         except Exception as e:
             logger.error(f"Error getting system config: {e}")
             return {}
     
+    def _watch_system_config(self, query):
+        """Attach a snapshot listener that keeps the cached config current"""
+        if self._config_watch is not None:
+            return
+        
+        def on_snapshot(docs, changes, read_time):
+            # Runs on the listener's thread; swapping the tuple is atomic
+            self._config_cache = (time.monotonic(), {doc.id: doc.to_dict() for doc in docs})
+        
+        try:
+            self._config_watch = query.on_snapshot(on_snapshot)
+        except Exception as e:
+            logger.warning(f"System config listener unavailable, using {SYSTEM_CONFIG_TTL}s cache: {e}")
+    
     async def update_system_config(self, config_key: str, config_value: Any) -> bool:
         """Update system configuration"""
         if not self.initialized:
             return False
         
         try:
-            doc_ref = self.db.collection(self.collections['system_config']).document(config_key)
-            doc_ref.set({
+            doc_ref = self._client().collection(self.collections['system_config']).document(config_key)
+            await self._run(doc_ref.set, {
                 'value': config_value,
                 'updatedAt': firestore.SERVER_TIMESTAMP
             })
             
+            # Don't serve the stale value until the listener catches up
+            self._config_cache = None
             logger.info(f"System config updated: {config_key}")
             return True
             
@@ -339,14 +572,25 @@ class FirestoreService:
             return False
         
         try:
-            batch = self.db.batch()
-            
-            for reading in readings:
-                data = self._prepare_sensor_data(reading, user_id)
-                doc_ref = self.db.collection(self.collections['sensor_readings']).document()
-                batch.set(doc_ref, data)
+            statuses = self._determine_quality_statuses(readings)
+            commits = []
+            
+            for start in range(0, len(readings), BULK_CHUNK_SIZE):
+                client = self._client()
+                batch = client.batch()
+                end = start + BULK_CHUNK_SIZE
+                for reading, status in zip(readings[start:end], statuses[start:end]):
+                    doc_ref = client.collection(self._sensor_collection_name(user_id, reading.timestamp)).document()
+                    batch.set(doc_ref, self._prepare_sensor_data(reading, user_id, status))
+                commits.append(self._run(COMMIT_RETRY(batch.commit)))
+            
+            # Mini-batches commit in parallel on the thread pool
+            results = await asyncio.gather(*commits, return_exceptions=True)
+            failed = [r for r in results if isinstance(r, Exception)]
+            if failed:
+                logger.error(f"{len(failed)} of {len(results)} sensor reading batches failed: {failed[0]}")
+                return False
             
-            batch.commit()
             logger.info(f"Batch saved {len(readings)} sensor readings")
             return True
             
@@ -361,27 +605,81 @@ class FirestoreService:
             return False
         
         try:
-            cutoff_date = datetime.now() - timedelta(days=days)
+            cutoff_date = self._get_timestamp() - timedelta(days=days)
+            client = self._client()
             
             # Clean up old sensor readings
-            query = (self.db.collection(self.collections['sensor_readings'])
-                    .where('createdAt', '<', cutoff_date.isoformat())
-                    .limit(100))
-            
-            docs = query.stream()
-            batch = self.db.batch()
-            
-            for doc in docs:
-                batch.delete(doc.reference)
+            queries = [(client.collection(name)
+                       .where('createdAt', '<', cutoff_date)
+                       .limit(CLEANUP_MAX_DELETES))
+                       for name in self._sensor_collection_names()]
             
-            batch.commit()
-            logger.info("Old data cleanup completed")
+            deleted = await self._run(self._bulk_delete, client, queries)
+            logger.info(f"Old data cleanup completed ({deleted} documents deleted)")
             return True
             
         except Exception as e:
             logger.error(f"Error cleaning up old data: {e}")
             return False
     
+    def _bulk_delete(self, client, queries: List[Any]) -> int:
+        """Delete every document the queries return through a BulkWriter (blocking)"""
+        bulk_writer = client.bulk_writer()
+        deleted = 0
+        try:
+            # BulkWriter batches and ramps up concurrency on its own
+            for query in queries:
+                for doc in query.stream():
+                    bulk_writer.delete(doc.reference)
+                    deleted += 1
+        finally:
+            bulk_writer.close()
+        return deleted
+    
+    # MIGRATION
+    async def migrate_legacy_created_at(self) -> int:
+        """Rewrite createdAt values stored as ISO strings as native Timestamps
+        
+        Older writers stored createdAt as an ISO string. Firestore orders values
+        by type first, so those documents never match the Timestamp range
+        filters used by the queries and cleanup_old_data(). Run once per
+        project (`python firestore_service.py`); returns documents converted.
+        """
+        if not self.initialized:
+            return 0
+        
+        client = self._client()
+        names = self._sensor_collection_names() + [
+            self.collections[name]
+            for name in ('alerts', 'control_actions', 'ml_analysis', 'maintenance_logs')
+        ]
+        
+        # A range filter on '' matches every string createdAt and nothing else
+        queries = [client.collection(name).where('createdAt', '>=', '') for name in names]
+        converted = await self._run(self._backfill_created_at, client, queries)
+        logger.info(f"Converted {converted} legacy string createdAt values to Timestamps")
+        return converted
+    
+    def _backfill_created_at(self, client, queries: List[Any]) -> int:
+        """Convert string createdAt fields on every document the queries return (blocking)"""
+        bulk_writer = client.bulk_writer()
+        converted = 0
+        try:
+            for query in queries:
+                for doc in query.stream():
+                    value = doc.get('createdAt')
+                    try:
+                        # Frontend strings end in 'Z'; backend ones are naive local time
+                        created_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+                    except ValueError:
+                        logger.warning(f"Skipping {doc.reference.path}: unparseable createdAt {value!r}")
+                        continue
+                    bulk_writer.update(doc.reference, {'createdAt': created_at.astimezone(timezone.utc)})
+                    converted += 1
+        finally:
+            bulk_writer.close()
+        return converted
+    
     # HEALTH CHECK
     def health_check(self) -> Dict:
         """Check Firestore connection health"""
@@ -392,26 +690,59 @@ class FirestoreService:
             'collections': self.collections
         }
 
-# Global instance
-firestore_service = FirestoreService()
+# Global instance, created on first use so importing this module doesn't
+# read credentials or open gRPC channels
+_service: Optional[FirestoreService] = None
+
+def get_service() -> FirestoreService:
+    """Shared FirestoreService, initialized on first call"""
+    global _service
+    if _service is None:
+        _service = FirestoreService()
+    return _service
+
+async def shutdown():
+    """Commit queued sensor writes if the service was ever created (call on app shutdown)"""
+    if _service is not None:
+        await _service.flush()
+
+def __getattr__(name: str):
+    # Keep `from firestore_service import firestore_service` working
+    if name == 'firestore_service':
+        return get_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Export convenience functions
 async def save_sensor_reading(reading: SensorReading, user_id: str = "system") -> Optional[str]:
-    return await firestore_service.save_sensor_reading(reading, user_id)
+    return await get_service().save_sensor_reading(reading, user_id)
 
 async def get_sensor_readings(hours: int = 24, limit: int = 100, user_id: str = "system") -> List[Dict]:
-    return await firestore_service.get_sensor_readings(hours, limit, user_id)
+    return await get_service().get_sensor_readings(hours, limit, user_id)
+
+def iter_sensor_readings(hours: int = 24, limit: int = 100, user_id: str = "system") -> AsyncIterator[Dict]:
+    return get_service().iter_sensor_readings(hours, limit, user_id)
 
 async def save_alert(alert_type: str, message: str, severity: str = "warning", 
                     user_id: str = "system", metadata: Dict = None) -> Optional[str]:
-    return await firestore_service.save_alert(alert_type, message, severity, user_id, metadata)
+    return await get_service().save_alert(alert_type, message, severity, user_id, metadata)
 
 async def get_alerts(limit: int = 50, user_id: str = "system", 
                     unresolved_only: bool = False) -> List[Dict]:
-    return await firestore_service.get_alerts(limit, user_id, unresolved_only)
+    return await get_service().get_alerts(limit, user_id, unresolved_only)
+
+def iter_alerts(limit: int = 50, user_id: str = "system",
+                unresolved_only: bool = False) -> AsyncIterator[Dict]:
+    return get_service().iter_alerts(limit, user_id, unresolved_only)
 
 async def save_ml_analysis(analysis_data: Dict, user_id: str = "system") -> Optional[str]:
-    return await firestore_service.save_ml_analysis(analysis_data, user_id)
+    return await get_service().save_ml_analysis(analysis_data, user_id)
 
 def get_health_check() -> Dict:
-    return firestore_service.health_check() 
\ No newline at end of file
+    return get_service().health_check() 
+
+async def migrate_legacy_created_at() -> int:
+    return await get_service().migrate_legacy_created_at()
+
+if __name__ == "__main__":
+    # One-off backfill of documents written before createdAt became a Timestamp
+    asyncio.run(migrate_legacy_created_at())
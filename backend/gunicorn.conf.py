@@ -0,0 +1,40 @@
+"""
+AquaSentinel Gunicorn Configuration
+Production server settings for the Flask backend (loaded automatically by `gunicorn app:app`)
+
+Environment variables:
+    PORT                    Port to bind (default 8000)
+    WEB_CONCURRENCY         Number of worker processes (default: CPUs this process may run on)
+    GUNICORN_WORKER_CLASS   Worker class (default gthread)
+    GUNICORN_THREADS        Request threads per gthread worker (default 8)
+    GUNICORN_TIMEOUT        Worker timeout in seconds (default 60)
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+
+if 'WEB_CONCURRENCY' in os.environ:
+    workers = int(os.environ['WEB_CONCURRENCY'])
+elif hasattr(os, 'sched_getaffinity'):
+    # CPUs this process may run on; cpu_count() reports the whole host inside
+    # a container (set WEB_CONCURRENCY to match a fractional CPU quota)
+    workers = len(os.sched_getaffinity(0))
+else:
+    workers = 2
+
+# Inference is CPU-bound: real OS threads let the inference pool and batch
+# scheduler in app.py run (and release the GIL inside numpy/scikit-learn)
+# without blocking other requests. Under gevent those threads would become
+# greenlets and every model call would stall the whole worker.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+
+# Load the model once in the master; forked workers share its read-only
+# arrays copy-on-write (per-process threads are restarted in app.py)
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+loglevel = 'info'
@@ -4,17 +4,25 @@ Handles MQTT messaging and data transmission to Firebase
 """
 
 import asyncio
+import functools
 import json
 import logging
+import time
 from datetime import datetime
-from typing import Dict, Optional, Callable, Any
-import paho.mqtt.client as mqtt
+from typing import Dict, List, Optional, Callable, Any
+import aiomqtt
 # import firebase_admin
 # from firebase_admin import credentials, db
 from sensors import SensorReading
 import os
 from dotenv import load_dotenv
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Load environment variables
 load_dotenv()
 
@@ -22,6 +30,30 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@functools.lru_cache(maxsize=4)
+def _iso_from_epoch(second: int) -> str:
+    """Local ISO-8601 timestamp for a whole epoch second (formatted once per second)"""
+    return datetime.fromtimestamp(second).isoformat()
+
+def _iso_now() -> str:
+    """Current time as an ISO-8601 string at one-second resolution"""
+    return _iso_from_epoch(int(time.time()))
+
+# Maximum queued messages handed to the client in one pipelined burst
+PUBLISH_BATCH_SIZE = 64
+
+def _encode_payload(payload: Dict) -> bytes:
+    """Serialize an MQTT payload to JSON bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload, default=str)
+    return json.dumps(payload, default=str).encode('utf-8')
+
+def _decode_payload(raw: bytes) -> Any:
+    """Parse a JSON MQTT payload"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw.decode('utf-8'))
+
 class MQTTManager:
     """Manages MQTT communication for IoT devices"""
     
@@ -36,120 +68,211 @@ class MQTTManager:
         self.username = username or os.getenv('MQTT_USERNAME')
         self.password = password or os.getenv('MQTT_PASSWORD')
         
-        self.client = mqtt.Client()
+        # asyncio-native client, live only while the connection task holds it open
+        self.client: Optional[aiomqtt.Client] = None
         self.is_connected = False
         self.message_callbacks = {}
         
-        # Setup MQTT callbacks
-        self.client.on_connect = self._on_connect
-        self.client.on_disconnect = self._on_disconnect
-        self.client.on_message = self._on_message
+        # Callback patterns compiled into a per-segment trie ('+' is a wildcard
+        # branch); leaves hold (registration order, callback) under the None key
+        self._trie = {}
+        
+        # Topics to (re)subscribe on every connect, and the outgoing message queue
+        self._subscriptions = {"aquasentinel/control/+", "aquasentinel/emergency"}
+        self._outbox: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._connected: Optional[asyncio.Event] = None
         
-        # Set credentials if provided
-        if self.username and self.password:
-            self.client.username_pw_set(self.username, self.password)
+        # One bounded queue and consumer task per handler, so a slow handler
+        # never holds up receiving messages for the others
+        self._handler_queues: Dict[Callable, asyncio.Queue] = {}
+        self._handler_tasks = []
+        self._subscribe_tasks = set()
+        self.dropped_messages = 0
     
-    def _on_connect(self, client, userdata, flags, rc):
-        """Callback for MQTT connection"""
-        if rc == 0:
-            self.is_connected = True
-            logger.info(f"Connected to MQTT broker: {self.broker}")
-            
-            # Subscribe to control topics
-            self.subscribe("aquasentinel/control/+")
-            self.subscribe("aquasentinel/emergency")
+    async def _run(self):
+        """Hold the broker connection open, dispatching messages and reconnecting on loss"""
+        while True:
+            publisher = None
+            try:
+                async with aiomqtt.Client(self.broker, port=self.port,
+                                          username=self.username if self.password else None,
+                                          password=self.password if self.username else None,
+                                          keepalive=60) as client:
+                    self.client = client
+                    self.is_connected = True
+                    self._connected.set()
+                    logger.info(f"Connected to MQTT broker: {self.broker}")
+                    
+                    for topic in self._subscriptions:
+                        await client.subscribe(topic)
+                        logger.info(f"Subscribed to topic: {topic}")
+                    
+                    publisher = asyncio.create_task(self._publish_loop(client))
+                    async for message in client.messages:
+                        self._on_message(message)
+                        
+            except aiomqtt.MqttError as e:
+                if self.is_connected:
+                    logger.warning("Disconnected from MQTT broker")
+                else:
+                    logger.error(f"Failed to connect to MQTT broker: {e}")
+            except Exception as e:
+                logger.error(f"MQTT connection error: {e}")
+            finally:
+                self.is_connected = False
+                self.client = None
+                self._connected.clear()
+                if publisher:
+                    publisher.cancel()
             
-        else:
-            logger.error(f"Failed to connect to MQTT broker. Code: {rc}")
+            await asyncio.sleep(5)
     
-    def _on_disconnect(self, client, userdata, rc):
-        """Callback for MQTT disconnection"""
-        self.is_connected = False
-        logger.warning("Disconnected from MQTT broker")
+    async def _publish_loop(self, client: aiomqtt.Client):
+        """Send queued messages on the event loop, pipelining whatever has piled up"""
+        while True:
+            batch = [await self._outbox.get()]
+            while len(batch) < PUBLISH_BATCH_SIZE and not self._outbox.empty():
+                batch.append(self._outbox.get_nowait())
+            
+            # Start every publish before awaiting any, so the queued QoS 0 packets
+            # reach the socket together in one write instead of one per round trip
+            results = await asyncio.gather(
+                *(client.publish(topic, message, qos=0) for topic, message in batch),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Error publishing MQTT message: {result}")
     
-    def _on_message(self, client, userdata, msg):
-        """Callback for received MQTT messages"""
+    def _on_message(self, msg: aiomqtt.Message):
+        """Route a received MQTT message to its handler"""
         try:
-            topic = msg.topic
-            payload = json.loads(msg.payload.decode('utf-8'))
+            topic = msg.topic.value
+            payload = _decode_payload(msg.payload)
             
             logger.info(f"Received message on {topic}: {payload}")
             
             # Route message to appropriate handler
-            if topic in self.message_callbacks:
-                self.message_callbacks[topic](payload)
-            else:
-                # Check for wildcard matches
-                for callback_topic, callback in self.message_callbacks.items():
-                    if '+' in callback_topic:
-                        if self._topic_matches(topic, callback_topic):
-                            callback(payload)
-                            break
-                            
+            callback = self.message_callbacks.get(topic) or self._match_callback(topic)
+            if callback:
+                self._handler_queue(callback).put_nowait(payload)
+                
+        except asyncio.QueueFull:
+            self.dropped_messages += 1
+            logger.warning(f"Handler queue full, dropped message on {topic} ({self.dropped_messages} dropped)")
         except Exception as e:
             logger.error(f"Error processing MQTT message: {e}")
     
-    def _topic_matches(self, topic: str, pattern: str) -> bool:
-        """Check if topic matches pattern with wildcards"""
-        topic_parts = topic.split('/')
-        pattern_parts = pattern.split('/')
-        
-        if len(topic_parts) != len(pattern_parts):
-            return False
+    def _handler_queue(self, callback: Callable) -> asyncio.Queue:
+        """Queue feeding a handler, starting its consumer on first use"""
+        queue = self._handler_queues.get(callback)
+        if queue is None:
+            queue = self._handler_queues[callback] = asyncio.Queue(maxsize=1024)
+            self._handler_tasks.append(asyncio.create_task(self._consume(queue, callback)))
+        return queue
+    
+    async def _consume(self, queue: asyncio.Queue, callback: Callable):
+        """Run a handler for each payload queued for it"""
+        while True:
+            payload = await queue.get()
+            try:
+                result = callback(payload)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Error in MQTT handler: {e}")
+    
+    def add_callback(self, pattern: str, callback: Callable):
+        """Route messages whose topic matches pattern ('+' matches one level) to callback"""
+        node = self._trie
+        for part in pattern.split('/'):
+            node = node.setdefault(part, {})
         
-        for topic_part, pattern_part in zip(topic_parts, pattern_parts):
-            if pattern_part != '+' and pattern_part != topic_part:
-                return False
+        # Re-registering a pattern keeps its original precedence
+        order = node[None][0] if None in node else len(self.message_callbacks)
+        node[None] = (order, callback)
+        self.message_callbacks[pattern] = callback
+    
+    def _match_callback(self, topic: str) -> Optional[Callable]:
+        """Earliest-registered callback whose pattern matches topic, walking the trie per segment"""
+        nodes = [self._trie]
+        for part in topic.split('/'):
+            nodes = [child for node in nodes
+                     for child in (node.get(part), node.get('+')) if child is not None]
+            if not nodes:
+                return None
         
-        return True
+        leaves = [node[None] for node in nodes if None in node]
+        return min(leaves, key=lambda leaf: leaf[0])[1] if leaves else None
     
     async def connect(self) -> bool:
         """Connect to MQTT broker"""
         try:
-            self.client.connect(self.broker, self.port, 60)
-            self.client.loop_start()
+            if self._task is None or self._task.done():
+                self._outbox = asyncio.Queue(maxsize=1000)
+                self._connected = asyncio.Event()
+                self._task = asyncio.create_task(self._run())
             
             # Wait for connection
-            for _ in range(10):
-                if self.is_connected:
-                    return True
-                await asyncio.sleep(0.5)
+            await asyncio.wait_for(self._connected.wait(), timeout=5.0)
+            return True
             
+        except asyncio.TimeoutError:
             logger.error("Timeout waiting for MQTT connection")
             return False
-            
         except Exception as e:
             logger.error(f"Error connecting to MQTT broker: {e}")
             return False
     
     def disconnect(self):
         """Disconnect from MQTT broker"""
-        if self.is_connected:
-            self.client.loop_stop()
-            self.client.disconnect()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        
+        for task in self._handler_tasks:
+            task.cancel()
+        self._handler_tasks.clear()
+        self._handler_queues.clear()
+        
+        for task in self._subscribe_tasks:
+            task.cancel()
+        self._subscribe_tasks.clear()
     
     def subscribe(self, topic: str, callback: Callable = None):
-        """Subscribe to MQTT topic"""
+        """Subscribe to MQTT topic (kept across reconnects)"""
+        self._subscriptions.add(topic)
+        if callback:
+            self.add_callback(topic, callback)
+        
         if self.is_connected:
-            self.client.subscribe(topic)
-            if callback:
-                self.message_callbacks[topic] = callback
+            # Hold a reference so the pending subscribe isn't garbage collected mid-flight
+            task = asyncio.get_running_loop().create_task(self.client.subscribe(topic))
+            self._subscribe_tasks.add(task)
+            task.add_done_callback(self._subscribe_tasks.discard)
             logger.info(f"Subscribed to topic: {topic}")
     
     def publish(self, topic: str, payload: Dict) -> bool:
-        """Publish message to MQTT topic"""
+        """Queue a message for the MQTT topic; False if not connected or the queue is full"""
         try:
-            if self.is_connected:
-                message = json.dumps(payload, default=str)
-                result = self.client.publish(topic, message)
-                return result.rc == mqtt.MQTT_ERR_SUCCESS
-            else:
-                logger.error("Not connected to MQTT broker")
-                return False
-                
+            return self.publish_raw(topic, _encode_payload(payload))
         except Exception as e:
             logger.error(f"Error publishing MQTT message: {e}")
             return False
+    
+    def publish_raw(self, topic: str, message: bytes) -> bool:
+        """Queue an already-encoded message for the MQTT topic"""
+        if not self.is_connected:
+            logger.error("Not connected to MQTT broker")
+            return False
+        
+        try:
+            self._outbox.put_nowait((topic, message))
+            return True
+        except asyncio.QueueFull:
+            logger.error(f"MQTT publish queue full, dropping message for {topic}")
+            return False
 
 class FirebaseManager:
     """Manages Firebase integration for cloud data storage"""
@@ -173,7 +296,8 @@ class FirebaseManager:
         """Save sensor reading to Firebase (mock for testing)"""
         try:
             # Mock Firebase save for testing
-            logger.debug(f"Mock Firebase save: {reading.to_dict()}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Mock Firebase save: %s", reading.to_dict())
             return True
             
         except Exception as e:
@@ -218,10 +342,13 @@ class IoTCommunicationHub:
         self.is_running = True
         logger.info("Starting IoT Communication Hub")
         
+        # Register handlers first: the connection task keeps retrying in the
+        # background, so they must be in place even if the first connect times out
+        self._setup_mqtt_handlers()
+        
         # Connect to MQTT
         if await self.mqtt_manager.connect():
             logger.info("MQTT connection established")
-            self._setup_mqtt_handlers()
         else:
             logger.error("Failed to establish MQTT connection")
     
@@ -259,8 +386,8 @@ class IoTCommunicationHub:
             )
         
         # Register handlers
-        self.mqtt_manager.message_callbacks['aquasentinel/control/+'] = handle_control_message
-        self.mqtt_manager.message_callbacks['aquasentinel/emergency'] = handle_emergency
+        self.mqtt_manager.add_callback('aquasentinel/control/+', handle_control_message)
+        self.mqtt_manager.add_callback('aquasentinel/emergency', handle_emergency)
     
     def _handle_valve_control(self, command: str):
         """Handle valve control commands"""
@@ -290,10 +417,8 @@ class IoTCommunicationHub:
     
     def publish_sensor_data(self, reading: SensorReading):
         """Publish sensor data to MQTT and Firebase"""
-        data = reading.to_dict()
-        
-        # Publish to MQTT
-        self.mqtt_manager.publish('aquasentinel/sensors/data', data)
+        # Publish to MQTT (the reading's JSON is encoded once and shared)
+        self.mqtt_manager.publish_raw('aquasentinel/sensors/data', reading.json_bytes)
         
         # Save to Firebase
         self.firebase_manager.save_sensor_data(reading)
@@ -305,7 +430,7 @@ class IoTCommunicationHub:
         payload = {
             'device': device,
             'command': command,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': _iso_now()
         }
         
         topic = f"aquasentinel/hardware/{device}"
@@ -319,7 +444,7 @@ class IoTCommunicationHub:
             'command': 'dispatch',
             'latitude': latitude,
             'longitude': longitude,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': _iso_now()
         }
         
         self.mqtt_manager.publish('aquasentinel/drone/dispatch', payload)
@@ -331,7 +456,7 @@ class IoTCommunicationHub:
             'type': alert_type,
             'message': message,
             'severity': severity,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': _iso_now()
         }
         
         # Publish to MQTT
@@ -341,6 +466,31 @@ class IoTCommunicationHub:
         self.firebase_manager.save_alert(alert_type, message, severity)
         
         logger.info(f"Alert published: {alert_type} - {message}")
+    
+    def publish_alerts(self, alerts: List[Dict]):
+        """Publish several alerts ({type, message, severity}) as one aquasentinel/alerts/batch message"""
+        if not alerts:
+            return
+        
+        timestamp = _iso_now()
+        payload = [
+            {
+                'type': alert['type'],
+                'message': alert['message'],
+                'severity': alert.get('severity', 'warning'),
+                'timestamp': timestamp
+            }
+            for alert in alerts
+        ]
+        
+        # Publish to MQTT
+        self.mqtt_manager.publish('aquasentinel/alerts/batch', payload)
+        
+        # Save to Firebase
+        for alert in payload:
+            self.firebase_manager.save_alert(alert['type'], alert['message'], alert['severity'])
+        
+        logger.info(f"{len(payload)} alerts published")
 
 # Global IoT communication hub instance
 iot_hub = IoTCommunicationHub()
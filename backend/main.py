@@ -4,17 +4,20 @@ Central API server that coordinates all system components
 """
 
 import asyncio
-import json
 import logging
+import os
+import socket
+import time
+import zlib
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set, Tuple, TypedDict
 from contextlib import asynccontextmanager
 
 # FastAPI imports
-from fastapi import FastAPI, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+import orjson
 import uvicorn
 
 # Local module imports
@@ -23,6 +26,7 @@ from iot_comm import iot_hub
 from ml_model_simple import analyze_water_quality, filter_predictor
 from controller import hardware_controller, drone_controller, process_control_command, initialize_controllers
 from weather_integration import weather_controller, get_weather_status
+import firestore_service
 
 # Configure logging
 logging.basicConfig(
@@ -31,61 +35,125 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Pydantic models for API requests/responses
-class SensorReadingResponse(BaseModel):
-    timestamp: str
-    tds: float
-    ph: float
-    orp: float
-    turbidity: float
-    temperature: float
-
-class ControlRequest(BaseModel):
-    command_type: str = Field(..., description="Type of control command (valve, filter, drone, emergency)")
-    command: str = Field(..., description="Specific command to execute")
-    latitude: Optional[float] = Field(None, description="Latitude for drone dispatch")
-    longitude: Optional[float] = Field(None, description="Longitude for drone dispatch")
-
-class SystemStatus(BaseModel):
-    sensors: Dict
-    controller: Dict
-    iot: Dict
-    ml: Dict
-    weather: Dict
-    timestamp: str
+def _subscription_confirmed(timestamp: str) -> str:
+    """Encoded subscription_confirmed reply"""
+    return orjson.dumps({
+        "type": "subscription_confirmed",
+        "timestamp": timestamp
+    }).decode()
+
+# Shape of messages clients send over the WebSocket
+class InboundMessage(TypedDict, total=False):
+    type: str
+
+# Seconds a serialized /sensors/history response is reused
+HISTORY_CACHE_TTL = 5.0
+
+# hours -> (computed at, JSON bytes); cleared whenever a new reading is saved
+_history_cache: Dict[int, Tuple[float, bytes]] = {}
+
+# Bumped on every clear, so a request that read the sensors before the clear
+# doesn't put its now-stale response back into the cache
+_history_generation = 0
+
+def _invalidate_history_cache():
+    """Drop cached history responses, including any still being built"""
+    global _history_generation
+    _history_generation += 1
+    _history_cache.clear()
+
+# Encoded drone status responses ("status" or "mission:<id>" -> JSON bytes),
+# valid while drone_controller.state_version is unchanged
+DRONE_CACHE_MAX = 256
+_drone_cache: Dict[str, bytes] = {}
+_drone_cache_version = -1
+
+def _cached_drone_response(key: str, build) -> Response:
+    """Serve an encoded drone status view, rebuilding only after a mission state change"""
+    global _drone_cache_version
+    if drone_controller.state_version != _drone_cache_version or len(_drone_cache) >= DRONE_CACHE_MAX:
+        _drone_cache.clear()
+        _drone_cache_version = drone_controller.state_version
+    
+    content = _drone_cache.get(key)
+    if content is None:
+        content = orjson.dumps(build())
+        _drone_cache[key] = content
+    return Response(content=content, media_type="application/json")
+
+# Messages buffered per client; a client that falls this far behind is dropped
+CLIENT_QUEUE_SIZE = 256
+
+# Broadcasts at least this large are zlib-compressed once and sent to every
+# client as a binary frame: COMPRESSED_FRAME_MAGIC + zlib data (pako.inflate)
+COMPRESS_MIN_BYTES = 1024
+COMPRESSED_FRAME_MAGIC = b"\x01"
 
 class WebSocketManager:
     """Manages WebSocket connections for real-time updates"""
     
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        # websocket -> (outbound queue, writer task)
+        self.active_connections: Dict[WebSocket, Tuple[asyncio.Queue, asyncio.Task]] = {}
+        # Close tasks for dropped clients, held until they finish
+        self._close_tasks: Set[asyncio.Task] = set()
     
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        writer = asyncio.create_task(self._writer(websocket, queue))
+        self.active_connections[websocket] = (queue, writer)
         logger.info("WebSocket client connected")
     
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        entry = self.active_connections.pop(websocket, None)
+        if entry:
+            entry[1].cancel()
             logger.info("WebSocket client disconnected")
     
+    async def _writer(self, websocket: WebSocket, queue: asyncio.Queue):
+        """Send a client's queued messages in order, at that client's own pace"""
+        try:
+            while True:
+                frame = await queue.get()
+                if isinstance(frame, bytes):
+                    await websocket.send_bytes(frame)
+                else:
+                    await websocket.send_text(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Failed to send message to WebSocket client: {e}")
+            self.disconnect(websocket)
+    
+    async def _close(self, websocket: WebSocket):
+        """Close a dropped client's socket, ignoring errors from an already-dead peer"""
+        try:
+            await websocket.close()
+        except Exception as e:
+            logger.debug(f"Error closing dropped WebSocket client: {e}")
+    
     async def broadcast(self, message: dict):
         """Broadcast message to all connected clients"""
         if not self.active_connections:
             return
         
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json.dumps(message, default=str))
-            except Exception as e:
-                logger.warning(f"Failed to send message to WebSocket client: {e}")
-                disconnected.append(connection)
+        # Serialize (and compress) once, then just enqueue; per-client writers do the sending
+        encoded = orjson.dumps(message, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
+        if len(encoded) >= COMPRESS_MIN_BYTES:
+            payload = COMPRESSED_FRAME_MAGIC + zlib.compress(encoded, 1)
+        else:
+            payload = encoded.decode()
         
-        # Remove disconnected clients
-        for conn in disconnected:
-            self.disconnect(conn)
+        for websocket, (queue, _) in list(self.active_connections.items()):
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                logger.warning("WebSocket client too slow, dropping connection")
+                self.disconnect(websocket)
+                task = asyncio.create_task(self._close(websocket))
+                self._close_tasks.add(task)
+                task.add_done_callback(self._close_tasks.discard)
 
 # Global WebSocket manager
 websocket_manager = WebSocketManager()
@@ -93,6 +161,18 @@ websocket_manager = WebSocketManager()
 # Background task state
 monitoring_active = False
 
+# Uvicorn worker processes; with more than one, only the worker holding the
+# monitoring lock port runs background_monitoring. Nothing is shared between
+# workers: WebSocket clients of the other workers get no broadcasts, and each
+# worker keeps its own controller, serial link and drone state. Use more than
+# one only for simulated, REST-only deployments (refused with a SERIAL_PORT).
+WORKERS = int(os.getenv("WORKERS", "1"))
+MONITOR_LOCK_PORT = int(os.getenv("MONITOR_LOCK_PORT", "8765"))
+_monitor_lock: Optional[socket.socket] = None
+
+# Minimum seconds between background ML analyses
+ANALYSIS_MIN_INTERVAL = 60.0
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifecycle"""
@@ -104,8 +184,11 @@ async def lifespan(app: FastAPI):
         await initialize_system()
         logger.info("All subsystems initialized successfully")
         
-        # Start background monitoring
-        asyncio.create_task(background_monitoring())
+        # Start background monitoring (once across all workers)
+        if claim_monitoring():
+            asyncio.create_task(background_monitoring())
+        else:
+            logger.info("Background monitoring runs in another worker")
         
     except Exception as e:
         logger.error(f"Failed to initialize system: {e}")
@@ -122,13 +205,20 @@ async def lifespan(app: FastAPI):
     
     # Stop IoT hub
     iot_hub.stop()
+    
+    # Close the weather HTTP session
+    await weather_controller.close()
+    
+    # Commit sensor readings still queued for Firestore
+    await firestore_service.shutdown()
 
 # Create FastAPI app
 app = FastAPI(
     title="AquaSentinel API",
     description="Intelligent Water Purification System API",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -170,14 +260,14 @@ async def health_check():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Health check failed: {str(e)}")
 
-@app.get("/status", response_model=SystemStatus)
+@app.get("/status")
 async def get_system_status():
     """Get comprehensive system status"""
     try:
         # Get status from all components
         sensor_status = {
             "running": sensor_manager.is_running,
-            "recent_readings_count": len(sensor_manager.get_recent_readings(hours=1))
+            "recent_readings_count": await asyncio.to_thread(sensor_manager.count_recent_readings, 1)
         }
         
         controller_status = hardware_controller.get_status()
@@ -194,14 +284,15 @@ async def get_system_status():
         
         weather_status = await get_weather_status()
         
-        return SystemStatus(
-            sensors=sensor_status,
-            controller=controller_status,
-            iot=iot_status,
-            ml=ml_status,
-            weather=weather_status,
-            timestamp=datetime.now().isoformat()
-        )
+        # Returned as a response directly; these dicts need no revalidation
+        return ORJSONResponse({
+            "sensors": sensor_status,
+            "controller": controller_status,
+            "iot": iot_status,
+            "ml": ml_status,
+            "weather": weather_status,
+            "timestamp": datetime.now().isoformat()
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get system status: {str(e)}")
@@ -212,14 +303,7 @@ async def get_current_reading():
     try:
         reading = await sensor_manager.read_sensor_data()
         if reading:
-            return SensorReadingResponse(
-                timestamp=reading.timestamp.isoformat(),
-                tds=reading.tds,
-                ph=reading.ph,
-                orp=reading.orp,
-                turbidity=reading.turbidity,
-                temperature=reading.temperature
-            )
+            return Response(content=reading.json_bytes, media_type="application/json")
         else:
             raise HTTPException(status_code=404, detail="No current sensor data available")
     except Exception as e:
@@ -232,46 +316,63 @@ async def get_sensor_history(hours: int = 24):
         if hours < 1 or hours > 168:  # Limit to 1 week
             raise HTTPException(status_code=400, detail="Hours must be between 1 and 168")
         
-        readings = sensor_manager.get_recent_readings(hours=hours)
+        now = time.monotonic()
+        cached = _history_cache.get(hours)
+        if cached and now - cached[0] < HISTORY_CACHE_TTL:
+            return Response(content=cached[1], media_type="application/json")
+        
+        generation = _history_generation
+        readings = await asyncio.to_thread(sensor_manager.get_recent_readings, hours)
         
-        return {
-            "readings": [
-                SensorReadingResponse(
-                    timestamp=r.timestamp.isoformat(),
-                    tds=r.tds,
-                    ph=r.ph,
-                    orp=r.orp,
-                    turbidity=r.turbidity,
-                    temperature=r.temperature
-                ) for r in readings
-            ],
+        payload = orjson.dumps({
+            "readings": [r.to_dict() for r in readings],
             "count": len(readings),
             "hours": hours
-        }
+        })
+        if generation == _history_generation:
+            _history_cache[hours] = (now, payload)
+        return Response(content=payload, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get sensor history: {str(e)}")
 
 @app.post("/control")
-async def execute_control_command(request: ControlRequest):
+async def execute_control_command(request: Request):
     """Execute hardware control command"""
+    # Body: command_type (valve, filter, drone, emergency), command, and
+    # latitude/longitude for drone dispatch; checked inline, no model pass
+    try:
+        body = orjson.loads(await request.body())
+        command_type = body["command_type"]
+        command = body["command"]
+        latitude = body.get("latitude")
+        longitude = body.get("longitude")
+    except (orjson.JSONDecodeError, KeyError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Body must be JSON with command_type and command")
+    
+    if not isinstance(command_type, str) or not isinstance(command, str):
+        raise HTTPException(status_code=400, detail="command_type and command must be strings")
+    for value in (latitude, longitude):
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            raise HTTPException(status_code=400, detail="latitude and longitude must be numbers")
+    
     try:
         result = await process_control_command(
-            command_type=request.command_type,
-            command=request.command,
-            latitude=request.latitude,
-            longitude=request.longitude
+            command_type=command_type,
+            command=command,
+            latitude=latitude,
+            longitude=longitude
         )
         
         # Broadcast control event to WebSocket clients
         await websocket_manager.broadcast({
             "type": "control_executed",
-            "command_type": request.command_type,
-            "command": request.command,
+            "command_type": command_type,
+            "command": command,
             "result": result,
             "timestamp": datetime.now().isoformat()
         })
         
-        return result
+        return ORJSONResponse(result)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Control command failed: {str(e)}")
@@ -280,7 +381,7 @@ async def execute_control_command(request: ControlRequest):
 async def get_ml_analysis(hours: int = 24, filter_usage_hours: float = 0, days_since_replacement: int = 0):
     """Get ML analysis of water quality and filter status"""
     try:
-        readings = sensor_manager.get_recent_readings(hours=hours)
+        readings = await asyncio.to_thread(sensor_manager.get_recent_readings, hours)
         
         if not readings:
             raise HTTPException(status_code=404, detail="No sensor data available for analysis")
@@ -308,7 +409,7 @@ async def get_weather_recommendations():
 async def get_drone_status():
     """Get drone system status"""
     try:
-        return drone_controller.get_drone_status()
+        return _cached_drone_response("status", drone_controller.get_drone_status)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get drone status: {str(e)}")
 
@@ -316,7 +417,9 @@ async def get_drone_status():
 async def get_mission_status(mission_id: str):
     """Get specific mission status"""
     try:
-        return drone_controller.get_mission_status(mission_id)
+        return _cached_drone_response(
+            f"mission:{mission_id}", lambda: drone_controller.get_mission_status(mission_id)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get mission status: {str(e)}")
 
@@ -336,7 +439,7 @@ async def emergency_stop():
         # Publish emergency alert through IoT hub
         iot_hub.publish_alert("emergency_stop", "Emergency stop activated via API", "critical")
         
-        return result
+        return ORJSONResponse(result)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Emergency stop failed: {str(e)}")
@@ -350,15 +453,12 @@ async def websocket_endpoint(websocket: WebSocket):
         while True:
             # Keep connection alive and handle incoming messages
             data = await websocket.receive_text()
-            message = json.loads(data)
+            message: InboundMessage = orjson.loads(data)
             
             # Handle different message types
             if message.get("type") == "subscribe":
                 # Client wants to subscribe to updates
-                await websocket.send_text(json.dumps({
-                    "type": "subscription_confirmed",
-                    "timestamp": datetime.now().isoformat()
-                }))
+                await websocket.send_text(_subscription_confirmed(datetime.now().isoformat()))
             
     except WebSocketDisconnect:
         websocket_manager.disconnect(websocket)
@@ -378,11 +478,31 @@ async def initialize_system():
     # Start IoT communication hub
     await iot_hub.start()
     
+    # Open the weather HTTP session and prime its cache before the first request
+    await weather_controller.warmup()
+    
     # Train ML model if not already trained
     if not filter_predictor.is_trained:
         logger.info("Training ML model...")
         filter_predictor.train_model()
 
+def claim_monitoring() -> bool:
+    """True if this process should run background monitoring (one worker wins the lock port)"""
+    global _monitor_lock
+    if WORKERS <= 1:
+        return True
+    
+    # The bound socket is the lock; the OS releases it when the worker exits
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.bind(("127.0.0.1", MONITOR_LOCK_PORT))
+    except OSError:
+        sock.close()
+        return False
+    
+    _monitor_lock = sock
+    return True
+
 async def background_monitoring():
     """Background task for continuous monitoring and data processing"""
     global monitoring_active
@@ -390,51 +510,90 @@ async def background_monitoring():
     
     logger.info("Starting background monitoring task")
     
+    # Readings processed so far, and when the last ML analysis ran; together
+    # they drive the periodic ML analysis
+    tick_counter = 0
+    last_analysis_ts = float("-inf")
+    
+    # Hot-path callables bound once for the lifetime of the loop
+    read = sensor_manager.read_sensor_data
+    save = sensor_manager.save_reading
+    validate = sensor_manager.validate_reading
+    get_recent = sensor_manager.get_recent_readings
+    publish = iot_hub.publish_sensor_data
+    publish_alerts = iot_hub.publish_alerts
+    broadcast = websocket_manager.broadcast
+    to_thread = asyncio.to_thread
+    monotonic = time.monotonic
+    
     while monitoring_active:
         try:
             # Get current sensor reading
-            reading = await sensor_manager.read_sensor_data()
+            reading = await read()
             
             if reading:
-                # Save to database
-                sensor_manager.save_reading(reading)
+                tick_counter += 1
                 
-                # Publish to IoT hub
-                iot_hub.publish_sensor_data(reading)
+                # Save to database off the event loop while the rest of the tick runs
+                save_task = asyncio.create_task(
+                    to_thread(save, reading)
+                )
+                
+                # Publish to IoT hub (non-blocking: queued for the MQTT loop)
+                publish(reading)
                 
                 # Validate reading and check for alerts
-                warnings = sensor_manager.validate_reading(reading)
+                warnings = validate(reading)
                 if warnings:
-                    for param, message in warnings.items():
-                        iot_hub.publish_alert(f"sensor_warning_{param}", message, "warning")
+                    publish_alerts([
+                        {"type": f"sensor_warning_{param}", "message": message, "severity": "warning"}
+                        for param, message in warnings.items()
+                    ])
                 
-                # Broadcast to WebSocket clients
-                await websocket_manager.broadcast({
+                # Updates for this tick, sent to clients as a single frame
+                updates = [{
                     "type": "sensor_update",
-                    "data": reading.to_dict(),
+                    "data": orjson.Fragment(reading.json_bytes),
                     "warnings": warnings
-                })
+                }]
                 
-                # Periodic ML analysis (every 10 readings)
-                if len(sensor_manager.get_recent_readings(hours=1)) % 10 == 0:
+                # Periodic ML analysis (every 10 readings, at most once per interval)
+                if (tick_counter % 10 == 0
+                        and monotonic() - last_analysis_ts > ANALYSIS_MIN_INTERVAL):
                     try:
-                        recent_readings = sensor_manager.get_recent_readings(hours=24)
+                        # The analysis window must include this tick's reading
+                        await save_task
+                        recent_readings = await to_thread(get_recent, 24)
                         analysis = await analyze_water_quality(recent_readings)
+                        last_analysis_ts = monotonic()
                         
                         # Check for critical alerts
                         alerts = analysis.get("alerts", [])
-                        for alert in alerts:
-                            if alert.get("severity") == "high":
-                                iot_hub.publish_alert(alert["type"], alert["message"], "high")
+                        publish_alerts([
+                            {"type": alert["type"], "message": alert["message"], "severity": "high"}
+                            for alert in alerts if alert.get("severity") == "high"
+                        ])
                         
-                        # Broadcast analysis to clients
-                        await websocket_manager.broadcast({
+                        updates.append({
                             "type": "ml_analysis",
                             "data": analysis
                         })
                         
                     except Exception as e:
                         logger.error(f"ML analysis error in background task: {e}")
+                
+                # Broadcast to WebSocket clients alongside the pending save
+                await asyncio.gather(
+                    save_task,
+                    broadcast({
+                        "type": "tick",
+                        "updates": updates
+                    }),
+                    return_exceptions=True
+                )
+                
+                # History responses cached before this reading landed are stale
+                _invalidate_history_cache()
             
             # Wait before next reading
             await asyncio.sleep(30)  # 30 second intervals
@@ -463,10 +622,23 @@ async def internal_error_handler(request, exc):
 if __name__ == "__main__":
     logger.info("Starting AquaSentinel API server...")
     
+    # Several workers would each open the serial port and drive the hardware
+    # from diverging state
+    if WORKERS > 1 and os.getenv("SERIAL_PORT"):
+        logger.error("WORKERS > 1 is not supported with SERIAL_PORT set; run a single worker")
+        raise SystemExit(1)
+    
+    # "auto" picks uvloop and httptools when installed (uvicorn[standard]),
+    # falling back to asyncio/h11 where uvloop is unavailable (Windows)
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
-        log_level="info"
+        loop="auto",
+        http="auto",
+        workers=WORKERS,
+        # Large broadcasts are compressed once in WebSocketManager instead
+        ws_per_message_deflate=False,
+        reload=os.getenv("DEV") == "1",
+        log_level="warning"
     ) 
\ No newline at end of file
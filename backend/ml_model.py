@@ -14,19 +14,47 @@ import sqlite3
 import asyncio
 
 # Machine Learning imports
-from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestClassifier
+from sklearn.inspection import permutation_importance
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, accuracy_score
 import joblib
 
+# Optional: compile the trained tree ensemble into tensor ops for faster inference
+try:
+    from hummingbird.ml import convert as hb_convert
+    HUMMINGBIRD_AVAILABLE = True
+except ImportError:
+    HUMMINGBIRD_AVAILABLE = False
+
 # Local imports
 from sensors import SensorReading
 
+# Optional: JIT-compile the anomaly kernel
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Sensor channels kept per reading, in column order
+READING_CHANNELS = ('tds', 'ph', 'orp', 'turbidity', 'temperature')
+
+def _recent_values(readings: List[SensorReading], n: int) -> np.ndarray:
+    """The newest n readings as an (n, 5) array"""
+    return np.array([
+        (r.tds, r.ph, r.orp, r.turbidity, r.temperature) for r in readings[-n:]
+    ], dtype=np.float64).reshape(-1, len(READING_CHANNELS))
+
+# Batches at least this large are predicted with all cores; smaller ones run
+# single-threaded, where joblib dispatch would cost more than it saves
+PARALLEL_PREDICT_MIN_ROWS = 1000
+
 class FilterSaturationPredictor:
     """Predicts filter saturation based on water quality metrics"""
     
@@ -35,6 +63,10 @@ class FilterSaturationPredictor:
         self.model = None
         self.scaler = StandardScaler()
         self.is_trained = False
+        self.n_jobs_predict = 1  # Predict workers (forest models) for batches under PARALLEL_PREDICT_MIN_ROWS
+        self._fast_model = None  # Compiled copy of self.model when Hummingbird is installed
+        self._scale_mean = None  # Fitted scaler parameters, applied inline in _predict
+        self._scale_std = None
         self.feature_columns = ['tds', 'ph', 'orp', 'turbidity', 'temperature', 
                                'flow_rate', 'usage_hours', 'days_since_replacement']
         
@@ -53,42 +85,25 @@ class FilterSaturationPredictor:
         if not readings:
             return np.array([])
         
-        # Get latest reading
-        latest = readings[-1]
-        
-        # Calculate derived features
-        features = {
-            'tds': latest.tds,
-            'ph': latest.ph,
-            'orp': latest.orp,
-            'turbidity': latest.turbidity,
-            'temperature': latest.temperature,
-            'flow_rate': flow_rate,
-            'usage_hours': filter_usage_hours,
-            'days_since_replacement': days_since_replacement
-        }
+        # Last (up to) 5 readings as rows of tds, ph, orp, turbidity, temperature
+        recent = _recent_values(readings, 5)
+        
+        # Order matches feature_columns + ['tds_trend', 'ph_trend', 'turbidity_variance']
+        features = np.empty(11, dtype=np.float64)
+        features[0:5] = recent[-1]
+        features[5] = flow_rate
+        features[6] = filter_usage_hours
+        features[7] = days_since_replacement
         
         # Add trend features if we have enough data
-        if len(readings) >= 5:
-            recent_readings = readings[-5:]
-            
-            # Calculate trends
-            tds_trend = np.mean([r.tds for r in recent_readings[-3:]]) - np.mean([r.tds for r in recent_readings[:2]])
-            ph_trend = np.mean([r.ph for r in recent_readings[-3:]]) - np.mean([r.ph for r in recent_readings[:2]])
-            
-            features.update({
-                'tds_trend': tds_trend,
-                'ph_trend': ph_trend,
-                'turbidity_variance': np.var([r.turbidity for r in recent_readings])
-            })
+        if len(recent) == 5:
+            # tds/ph trends: mean of the last 3 minus mean of the first 2
+            features[8:10] = recent[-3:, 0:2].mean(axis=0) - recent[:2, 0:2].mean(axis=0)
+            features[10] = recent[:, 3].var()
         else:
-            features.update({
-                'tds_trend': 0,
-                'ph_trend': 0,
-                'turbidity_variance': 0
-            })
+            features[8:11] = 0
         
-        return np.array([features[col] for col in self.feature_columns + ['tds_trend', 'ph_trend', 'turbidity_variance']])
+        return features
     
     def generate_training_data(self, db_path: str = "./aquasentinel.db") -> Tuple[np.ndarray, np.ndarray]:
         """Generate synthetic training data based on real sensor patterns"""
@@ -175,13 +190,14 @@ class FilterSaturationPredictor:
         # Scale features
         X_train_scaled = self.scaler.fit_transform(X_train)
         X_test_scaled = self.scaler.transform(X_test)
-        
-        # Train Random Forest model
-        self.model = RandomForestRegressor(
-            n_estimators=100,
-            max_depth=10,
-            random_state=42,
-            n_jobs=-1
+        self._cache_scaler()
+        
+        # Train histogram gradient boosting model (compact shallow trees, fast predict)
+        self.model = HistGradientBoostingRegressor(
+            max_iter=100,
+            max_depth=8,
+            learning_rate=0.1,
+            random_state=42
         )
         
         self.model.fit(X_train_scaled, y_train)
@@ -195,16 +211,36 @@ class FilterSaturationPredictor:
         
         logger.info(f"Model training completed. Train RMSE: {train_rmse:.2f}, Test RMSE: {test_rmse:.2f}")
         
-        # Feature importance
+        # Feature importance (boosted trees expose none, so measure it by permutation)
         feature_names = self.feature_columns + ['tds_trend', 'ph_trend', 'turbidity_variance']
-        importance = self.model.feature_importances_
+        importance = permutation_importance(
+            self.model, X_test_scaled, y_test, n_repeats=5, random_state=42
+        ).importances_mean
         
         for name, imp in zip(feature_names, importance):
             logger.info(f"Feature importance - {name}: {imp:.3f}")
         
         self.is_trained = True
+        self._compile_model()
         self.save_model()
     
+    def _cache_scaler(self):
+        """Keep the fitted scaler's mean/scale as plain arrays for inline scaling"""
+        self._scale_mean = np.asarray(self.scaler.mean_, dtype=np.float64)
+        self._scale_std = np.asarray(self.scaler.scale_, dtype=np.float64)
+    
+    def _compile_model(self):
+        """Compile the tree ensemble to a GEMM tensor kernel (Hummingbird); keep sklearn on failure"""
+        self._fast_model = None
+        if not HUMMINGBIRD_AVAILABLE or self.model is None:
+            return
+        
+        try:
+            self._fast_model = hb_convert(self.model, 'pytorch', extra_config={'tree_implementation': 'gemm'})
+            logger.info("Filter model compiled for fast inference")
+        except Exception as e:
+            logger.warning(f"Could not compile filter model, using scikit-learn predict: {e}")
+    
     def predict_saturation(self, readings: List[SensorReading], 
                           filter_usage_hours: float = 0,
                           days_since_replacement: int = 0) -> Dict:
@@ -219,11 +255,51 @@ class FilterSaturationPredictor:
         if len(features) == 0:
             return {"error": "No data available for prediction"}
         
-        # Scale features
-        features_scaled = self.scaler.transform(features.reshape(1, -1))
+        saturation = self._predict(features.reshape(1, -1))[0]
+        return self._saturation_result(saturation, days_since_replacement)
+    
+    def predict_saturation_batch(self, readings_batches: List[List[SensorReading]],
+                                 filter_usage_hours: float = 0,
+                                 days_since_replacement: int = 0) -> List[Dict]:
+        """Predict saturation for several reading windows with one scale + predict pass"""
         
-        # Make prediction
-        saturation = self.model.predict(features_scaled)[0]
+        if not self.is_trained or self.model is None:
+            logger.warning("Model not trained. Training with synthetic data...")
+            self.train_model()
+        
+        results: List[Optional[Dict]] = [None] * len(readings_batches)
+        rows = []
+        row_positions = []
+        
+        for i, readings in enumerate(readings_batches):
+            features = self.prepare_features(readings, filter_usage_hours, days_since_replacement)
+            if len(features) == 0:
+                results[i] = {"error": "No data available for prediction"}
+            else:
+                rows.append(features)
+                row_positions.append(i)
+        
+        if rows:
+            saturations = self._predict(np.vstack(rows))
+            for i, saturation in zip(row_positions, saturations):
+                results[i] = self._saturation_result(saturation, days_since_replacement)
+        
+        return results
+    
+    def _predict(self, X: np.ndarray) -> np.ndarray:
+        """Scale a feature matrix and run the model once over all of its rows"""
+        # Same arithmetic as StandardScaler.transform without its validation overhead
+        X_scaled = (X - self._scale_mean) / self._scale_std
+        if self._fast_model is not None:
+            return self._fast_model.predict(X_scaled)
+        
+        # Forests saved by older versions parallelize predict through n_jobs
+        if hasattr(self.model, 'n_jobs'):
+            self.model.n_jobs = -1 if len(X) >= PARALLEL_PREDICT_MIN_ROWS else self.n_jobs_predict
+        return self.model.predict(X_scaled)
+    
+    def _saturation_result(self, saturation: float, days_since_replacement: int) -> Dict:
+        """Clamp a raw saturation prediction and derive the replacement estimate"""
         saturation = max(0, min(100, saturation))  # Clamp between 0-100%
         
         # Estimate time until replacement needed (assuming 80% saturation threshold)
@@ -251,7 +327,7 @@ class FilterSaturationPredictor:
                 'is_trained': self.is_trained
             }
             
-            joblib.dump(model_data, self.model_path)
+            joblib.dump(model_data, self.model_path, compress=3)
             logger.info(f"Model saved to {self.model_path}")
             
         except Exception as e:
@@ -267,6 +343,9 @@ class FilterSaturationPredictor:
                 self.scaler = model_data['scaler']
                 self.feature_columns = model_data['feature_columns']
                 self.is_trained = model_data['is_trained']
+                if self.is_trained:
+                    self._cache_scaler()
+                self._compile_model()
                 
                 logger.info("Model loaded successfully")
             else:
@@ -275,11 +354,48 @@ class FilterSaturationPredictor:
         except Exception as e:
             logger.error(f"Error loading model: {e}")
 
+# Anomaly codes per (reading, parameter) cell; absolute range wins, then IQR, then std dev
+ANOMALY_NONE, ANOMALY_RANGE, ANOMALY_STDDEV, ANOMALY_IQR = 0, 1, 2, 3
+
+# Rows of the (5 stats, 5 channels) baseline matrix
+BASELINE_STATS = ('mean', 'std', 'q25', 'median', 'q75')
+B_MEAN, B_STD, B_Q25, B_MEDIAN, B_Q75 = range(len(BASELINE_STATS))
+
+def _anomaly_codes_numpy(values, abs_lo, abs_hi, baseline, has_baseline):
+    """Anomaly code matrix for an (N, 5) array of readings"""
+    codes = np.zeros(values.shape, dtype=np.int8)
+    if has_baseline:
+        iqr = baseline[B_Q75] - baseline[B_Q25]
+        codes[np.abs(values - baseline[B_MEAN]) > 3 * baseline[B_STD]] = ANOMALY_STDDEV
+        codes[np.abs(values - baseline[B_MEDIAN]) > 2 * iqr] = ANOMALY_IQR
+    codes[(values < abs_lo) | (values > abs_hi)] = ANOMALY_RANGE
+    return codes
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _anomaly_codes(values, abs_lo, abs_hi, baseline, has_baseline):
+        """Anomaly code matrix for an (N, 5) array of readings (compiled)"""
+        codes = np.zeros(values.shape, dtype=np.int8)
+        for i in range(values.shape[0]):
+            for j in range(values.shape[1]):
+                v = values[i, j]
+                if v < abs_lo[j] or v > abs_hi[j]:
+                    codes[i, j] = ANOMALY_RANGE
+                elif has_baseline:
+                    iqr = baseline[B_Q75, j] - baseline[B_Q25, j]
+                    if abs(v - baseline[B_MEDIAN, j]) > 2 * iqr:
+                        codes[i, j] = ANOMALY_IQR
+                    elif abs(v - baseline[B_MEAN, j]) > 3 * baseline[B_STD, j]:
+                        codes[i, j] = ANOMALY_STDDEV
+        return codes
+else:
+    _anomaly_codes = _anomaly_codes_numpy
+
 class AnomalyDetector:
     """Detects anomalies in sensor readings"""
     
     def __init__(self):
-        self.baseline_stats = {}
+        self.baseline = None  # (5 stats, 5 channels) matrix, rows per BASELINE_STATS
         self.anomaly_thresholds = {
             'tds': {'min': 50, 'max': 800},
             'ph': {'min': 6.0, 'max': 9.0},
@@ -287,51 +403,72 @@ class AnomalyDetector:
             'turbidity': {'min': 0, 'max': 5.0},
             'temperature': {'min': 10, 'max': 35}
         }
+        
+        # Array forms of the thresholds consumed by _anomaly_codes
+        self._abs_lo = np.array([self.anomaly_thresholds[p]['min'] for p in READING_CHANNELS], dtype=np.float64)
+        self._abs_hi = np.array([self.anomaly_thresholds[p]['max'] for p in READING_CHANNELS], dtype=np.float64)
+        self._no_baseline = np.zeros((len(BASELINE_STATS), len(READING_CHANNELS)))
+    
+    @property
+    def baseline_stats(self) -> Dict[str, Dict[str, float]]:
+        """Baseline as {param: {stat: value}} (built on demand from the matrix)"""
+        if self.baseline is None:
+            return {}
+        return {
+            param: {stat: self.baseline[i, j] for i, stat in enumerate(BASELINE_STATS)}
+            for j, param in enumerate(READING_CHANNELS)
+        }
     
     def update_baseline(self, readings: List[SensorReading]):
         """Update baseline statistics from recent normal readings"""
         if len(readings) < 10:
             return
         
-        # Calculate statistics for each parameter
-        for param in ['tds', 'ph', 'orp', 'turbidity', 'temperature']:
-            values = [getattr(r, param) for r in readings[-50:]]  # Use last 50 readings
-            
-            self.baseline_stats[param] = {
-                'mean': np.mean(values),
-                'std': np.std(values),
-                'median': np.median(values),
-                'q25': np.percentile(values, 25),
-                'q75': np.percentile(values, 75)
-            }
+        # All statistics for all channels over the last 50 readings in three passes
+        values = _recent_values(readings, 50)
+        baseline = np.empty((len(BASELINE_STATS), values.shape[1]))
+        baseline[B_MEAN] = values.mean(axis=0)
+        baseline[B_STD] = values.std(axis=0)
+        baseline[B_Q25:B_Q75 + 1] = np.percentile(values, [25, 50, 75], axis=0)
+        self.baseline = baseline
     
     def detect_anomalies(self, reading: SensorReading) -> Dict[str, str]:
         """Detect anomalies in a sensor reading"""
-        anomalies = {}
+        return self.detect_anomalies_batch([reading])[0]
+    
+    def detect_anomalies_batch(self, readings: List[SensorReading]) -> List[Dict[str, str]]:
+        """Detect anomalies in many readings with one pass of the anomaly kernel"""
+        if not readings:
+            return []
         
-        for param in ['tds', 'ph', 'orp', 'turbidity', 'temperature']:
-            value = getattr(reading, param)
-            
-            # Check absolute thresholds
-            thresholds = self.anomaly_thresholds[param]
-            if value < thresholds['min'] or value > thresholds['max']:
-                anomalies[param] = f"Value {value} outside normal range ({thresholds['min']}-{thresholds['max']})"
-                continue
-            
-            # Check against baseline if available
-            if param in self.baseline_stats:
-                stats = self.baseline_stats[param]
-                
-                # Check for outliers (3 standard deviations)
-                if abs(value - stats['mean']) > 3 * stats['std']:
-                    anomalies[param] = f"Value {value} is {abs(value - stats['mean']) / stats['std']:.1f} std dev from normal"
-                
-                # Check for significant deviation from median
-                iqr = stats['q75'] - stats['q25']
-                if abs(value - stats['median']) > 2 * iqr:
-                    anomalies[param] = f"Value {value} significantly different from typical range"
+        values = _recent_values(readings, len(readings))
+        has_baseline = self.baseline is not None
+        codes = _anomaly_codes(
+            values, self._abs_lo, self._abs_hi,
+            self.baseline if has_baseline else self._no_baseline, has_baseline
+        )
+        
+        # Messages are only formatted for flagged cells
+        results = []
+        for row, reading in zip(codes, readings):
+            anomalies = {}
+            for j in np.flatnonzero(row):
+                param = READING_CHANNELS[j]
+                anomalies[param] = self._describe(j, getattr(reading, param), row[j])
+            results.append(anomalies)
+        return results
+    
+    def _describe(self, channel: int, value: float, code: int) -> str:
+        """Message for one flagged parameter (channel is its READING_CHANNELS index)"""
+        if code == ANOMALY_RANGE:
+            thresholds = self.anomaly_thresholds[READING_CHANNELS[channel]]
+            return f"Value {value} outside normal range ({thresholds['min']}-{thresholds['max']})"
+        
+        if code == ANOMALY_IQR:
+            return f"Value {value} significantly different from typical range"
         
-        return anomalies
+        mean, std = self.baseline[B_MEAN, channel], self.baseline[B_STD, channel]
+        return f"Value {value} is {abs(value - mean) / std:.1f} std dev from normal"
 
 class WaterQualityOptimizer:
     """Optimizes water treatment based on input conditions and goals"""
@@ -343,6 +480,12 @@ class WaterQualityOptimizer:
             'orp': {'min': 300, 'max': 600, 'optimal': 450},
             'turbidity': {'min': 0, 'max': 1.0, 'optimal': 0.2}
         }
+        
+        # Target ranges as arrays (tds, ph, orp, turbidity) for the vectorized score
+        params = ('tds', 'ph', 'orp', 'turbidity')
+        self._tmin = np.array([self.target_ranges[p]['min'] for p in params], dtype=np.float64)
+        self._tmax = np.array([self.target_ranges[p]['max'] for p in params], dtype=np.float64)
+        self._topt = np.array([self.target_ranges[p]['optimal'] for p in params], dtype=np.float64)
     
     def get_optimization_recommendations(self, reading: SensorReading) -> Dict:
         """Get recommendations for optimizing water quality"""
@@ -381,45 +524,35 @@ class WaterQualityOptimizer:
         if not recommendations:
             recommendations.append("Water quality within optimal ranges")
         
+        quality_score = self._calculate_quality_score(reading)
+        
         return {
             "recommendations": recommendations,
             "actions": actions,
-            "quality_score": self._calculate_quality_score(reading),
-            "overall_status": self._get_overall_status(reading)
+            "quality_score": quality_score,
+            "overall_status": self._get_overall_status(quality_score)
         }
     
     def _calculate_quality_score(self, reading: SensorReading) -> float:
         """Calculate overall water quality score (0-100)"""
-        scores = []
-        
-        for param in ['tds', 'ph', 'orp', 'turbidity']:
-            value = getattr(reading, param)
-            target = self.target_ranges[param]
+        v = np.array([reading.tds, reading.ph, reading.orp, reading.turbidity], dtype=np.float64)
+        tmin, tmax, topt = self._tmin, self._tmax, self._topt
+        
+        # Every branch is evaluated for all four values; np.where keeps the right one
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Linear score within acceptable range: 80 at the limits, 100 at optimal
+            below_optimal = 80 + 20 * (v - tmin) / (topt - tmin)
+            above_optimal = 80 + 20 * (tmax - v) / (tmax - topt)
+            in_range = np.where(v < topt, below_optimal, above_optimal)
             
-            # Calculate how close the value is to optimal
-            if value == target['optimal']:
-                score = 100
-            elif target['min'] <= value <= target['max']:
-                # Linear score within acceptable range
-                if value < target['optimal']:
-                    score = 80 + 20 * (value - target['min']) / (target['optimal'] - target['min'])
-                else:
-                    score = 80 + 20 * (target['max'] - value) / (target['max'] - target['optimal'])
-            else:
-                # Outside acceptable range
-                if value < target['min']:
-                    score = max(0, 80 * (value / target['min']))
-                else:
-                    score = max(0, 80 * (target['max'] / value))
-            
-            scores.append(score)
+            # Outside acceptable range
+            out_of_range = np.maximum(0, 80 * np.where(v < tmin, v / tmin, tmax / v))
         
-        return round(np.mean(scores), 1)
+        scores = np.where((v >= tmin) & (v <= tmax), in_range, out_of_range)
+        return round(float(scores.mean()), 1)
     
-    def _get_overall_status(self, reading: SensorReading) -> str:
-        """Get overall water quality status"""
-        score = self._calculate_quality_score(reading)
-        
+    def _get_overall_status(self, score: float) -> str:
+        """Get overall water quality status from its quality score"""
         if score >= 90:
             return "excellent"
         elif score >= 80:
@@ -11,8 +11,98 @@ from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit when numba is not installed"""
+        return lambda func: func
+
 logger = logging.getLogger(__name__)
 
+@njit(cache=True)
+def _quality_score(ph, turbidity, hardness, chloramines, sulfate, conductivity,
+                   organic_carbon, trihalomethanes, solids):
+    """Score the nine water parameters (0-100); compiled with numba when available"""
+    score = 0
+    
+    # pH score (ideal: 6.5-8.5)
+    if 6.5 <= ph <= 8.5:
+        score += 15
+    elif 6.0 <= ph <= 9.0:
+        score += 10
+    elif 5.5 <= ph <= 9.5:
+        score += 5
+    
+    # Turbidity score (lower is better)
+    if turbidity < 1:
+        score += 15
+    elif turbidity < 4:
+        score += 10
+    elif turbidity < 10:
+        score += 5
+    
+    # Hardness score
+    if 100 <= hardness <= 300:
+        score += 10
+    elif 50 <= hardness <= 400:
+        score += 7
+    elif hardness <= 500:
+        score += 3
+    
+    # Chloramines score
+    if chloramines < 4:
+        score += 10
+    elif chloramines < 8:
+        score += 7
+    elif chloramines < 12:
+        score += 3
+    
+    # Sulfate score
+    if sulfate < 250:
+        score += 10
+    elif sulfate < 400:
+        score += 7
+    elif sulfate < 500:
+        score += 3
+    
+    # Conductivity score
+    if conductivity < 300:
+        score += 10
+    elif conductivity < 500:
+        score += 7
+    elif conductivity < 700:
+        score += 3
+    
+    # Organic carbon score
+    if organic_carbon < 10:
+        score += 10
+    elif organic_carbon < 20:
+        score += 7
+    elif organic_carbon < 25:
+        score += 3
+    
+    # Trihalomethanes score
+    if trihalomethanes < 50:
+        score += 10
+    elif trihalomethanes < 100:
+        score += 7
+    elif trihalomethanes < 150:
+        score += 3
+    
+    # Solids score
+    if solids < 15000:
+        score += 10
+    elif solids < 25000:
+        score += 7
+    elif solids < 35000:
+        score += 3
+    
+    return min(score, 100)
+
 class WaterQualityPredictor:
     """Main class for water quality prediction using ML models"""
     
@@ -225,91 +315,17 @@ class WaterQualityPredictor:
     
     def calculate_quality_score(self, data):
         """Calculate overall water quality score"""
-        score = 0
-        max_score = 100
-        
-        # pH score (ideal: 6.5-8.5)
-        ph = data.get('ph', 7)
-        if 6.5 <= ph <= 8.5:
-            score += 15
-        elif 6.0 <= ph <= 9.0:
-            score += 10
-        elif 5.5 <= ph <= 9.5:
-            score += 5
-        
-        # Turbidity score (lower is better)
-        turbidity = data.get('turbidity', 4)
-        if turbidity < 1:
-            score += 15
-        elif turbidity < 4:
-            score += 10
-        elif turbidity < 10:
-            score += 5
-        
-        # Hardness score
-        hardness = data.get('hardness', 200)
-        if 100 <= hardness <= 300:
-            score += 10
-        elif 50 <= hardness <= 400:
-            score += 7
-        elif hardness <= 500:
-            score += 3
-        
-        # Chloramines score
-        chloramines = data.get('chloramines', 7)
-        if chloramines < 4:
-            score += 10
-        elif chloramines < 8:
-            score += 7
-        elif chloramines < 12:
-            score += 3
-        
-        # Sulfate score
-        sulfate = data.get('sulfate', 250)
-        if sulfate < 250:
-            score += 10
-        elif sulfate < 400:
-            score += 7
-        elif sulfate < 500:
-            score += 3
-        
-        # Conductivity score
-        conductivity = data.get('conductivity', 400)
-        if conductivity < 300:
-            score += 10
-        elif conductivity < 500:
-            score += 7
-        elif conductivity < 700:
-            score += 3
-        
-        # Organic carbon score
-        organic_carbon = data.get('organic_carbon', 14)
-        if organic_carbon < 10:
-            score += 10
-        elif organic_carbon < 20:
-            score += 7
-        elif organic_carbon < 25:
-            score += 3
-        
-        # Trihalomethanes score
-        trihalomethanes = data.get('trihalomethanes', 70)
-        if trihalomethanes < 50:
-            score += 10
-        elif trihalomethanes < 100:
-            score += 7
-        elif trihalomethanes < 150:
-            score += 3
-        
-        # Solids score
-        solids = data.get('solids', 20000)
-        if solids < 15000:
-            score += 10
-        elif solids < 25000:
-            score += 7
-        elif solids < 35000:
-            score += 3
-        
-        return min(score, max_score)
+        return int(_quality_score(
+            float(data.get('ph', 7)),
+            float(data.get('turbidity', 4)),
+            float(data.get('hardness', 200)),
+            float(data.get('chloramines', 7)),
+            float(data.get('sulfate', 250)),
+            float(data.get('conductivity', 400)),
+            float(data.get('organic_carbon', 14)),
+            float(data.get('trihalomethanes', 70)),
+            float(data.get('solids', 20000))
+        ))
     
     def generate_insights(self, data, prediction, confidence):
         """Generate insights based on prediction and data"""
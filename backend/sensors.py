@@ -4,20 +4,30 @@ Handles reading data from TDS, pH, ORP, and Turbidity sensors
 """
 
 import asyncio
+import functools
 import json
 import sqlite3
 import time
 from datetime import datetime
-from typing import Dict, Optional, List
-from dataclasses import dataclass, asdict
+from typing import Dict, Optional, List, Tuple
+from dataclasses import dataclass
 import serial
 import logging
 from pathlib import Path
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# How long a recent-readings count is reused before re-querying (seconds)
+RECENT_COUNT_TTL = 5.0
+
 @dataclass
 class SensorReading:
     """Data class for sensor readings"""
@@ -30,9 +40,21 @@ class SensorReading:
     
     def to_dict(self) -> Dict:
         """Convert to dictionary for JSON serialization"""
-        data = asdict(self)
-        data['timestamp'] = self.timestamp.isoformat()
-        return data
+        return {
+            'timestamp': self.timestamp.isoformat(),
+            'tds': self.tds,
+            'ph': self.ph,
+            'orp': self.orp,
+            'turbidity': self.turbidity,
+            'temperature': self.temperature
+        }
+    
+    @functools.cached_property
+    def json_bytes(self) -> bytes:
+        """to_dict() encoded as JSON, computed once per reading and shared by all sinks"""
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(self.to_dict())
+        return json.dumps(self.to_dict()).encode('utf-8')
 
 class SensorManager:
     """Manages all water quality sensors"""
@@ -46,6 +68,9 @@ class SensorManager:
         self.db_path = db_path
         self.serial_connection: Optional[serial.Serial] = None
         self.is_running = False
+        
+        # hours -> (computed at, count) for count_recent_readings()
+        self._recent_count_cache: Dict[int, Tuple[float, int]] = {}
         self._init_database()
         
     def _init_database(self):
@@ -224,6 +249,33 @@ class SensorManager:
             logger.error(f"Error retrieving readings: {e}")
             return []
     
+    def count_recent_readings(self, hours: int = 1) -> int:
+        """Number of readings in the last `hours`, cached for RECENT_COUNT_TTL seconds"""
+        now = time.monotonic()
+        cached = self._recent_count_cache.get(hours)
+        if cached and now - cached[0] < RECENT_COUNT_TTL:
+            return cached[1]
+        
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT COUNT(*)
+                FROM sensor_readings
+                WHERE datetime(timestamp) >= datetime('now', ?)
+            ''', (f'-{int(hours)} hours',))
+            
+            count = cursor.fetchone()[0]
+            conn.close()
+            
+            self._recent_count_cache[hours] = (now, count)
+            return count
+            
+        except Exception as e:
+            logger.error(f"Error counting readings: {e}")
+            return 0
+    
     def validate_reading(self, reading: SensorReading) -> Dict[str, str]:
         """Validate sensor reading against safe water standards"""
         warnings = {}
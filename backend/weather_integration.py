@@ -12,6 +12,12 @@ from typing import Dict, Optional, List
 import os
 from dotenv import load_dotenv
 
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
 # Load environment variables
 load_dotenv()
 
@@ -28,6 +34,39 @@ class WeatherDataManager:
         self.cache = {}
         self.cache_duration = 600  # 10 minutes cache
         
+        # Shared HTTP session (keep-alive connections, cached DNS); opened on first use
+        self._session = None
+    
+    async def start(self):
+        """Open the shared HTTP session if it is not open yet"""
+        if AIOHTTP_AVAILABLE and (self._session is None or self._session.closed):
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=20, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=10)
+            )
+    
+    async def close(self):
+        """Close the shared HTTP session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def _fetch_json(self, url: str, params: Dict) -> Optional[Dict]:
+        """GET a JSON document from the weather API; None on a non-200 response"""
+        if not AIOHTTP_AVAILABLE:
+            response = await asyncio.to_thread(requests.get, url, params=params, timeout=10)
+            if response.status_code != 200:
+                logger.error(f"Weather API error: {response.status_code}")
+                return None
+            return response.json()
+        
+        await self.start()
+        async with self._session.get(url, params=params) as response:
+            if response.status != 200:
+                logger.error(f"Weather API error: {response.status}")
+                return None
+            return await response.json()
+        
     async def get_current_weather(self, latitude: float, longitude: float) -> Optional[Dict]:
         """Get current weather data for given coordinates"""
         
@@ -47,22 +86,18 @@ class WeatherDataManager:
                 'units': 'metric'
             }
             
-            response = requests.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Cache the result
-                self.cache[cache_key] = {
-                    "data": data,
-                    "timestamp": datetime.now()
-                }
-                
-                logger.info(f"Weather data retrieved for {latitude}, {longitude}")
-                return data
-            else:
-                logger.error(f"Weather API error: {response.status_code}")
+            data = await self._fetch_json(url, params)
+            if data is None:
                 return None
+            
+            # Cache the result
+            self.cache[cache_key] = {
+                "data": data,
+                "timestamp": datetime.now()
+            }
+            
+            logger.info(f"Weather data retrieved for {latitude}, {longitude}")
+            return data
                         
         except Exception as e:
             logger.error(f"Error fetching weather data: {e}")
@@ -87,22 +122,18 @@ class WeatherDataManager:
                 'cnt': days * 8  # 8 forecasts per day (3-hour intervals)
             }
             
-            response = requests.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Cache the result
-                self.cache[cache_key] = {
-                    "data": data,
-                    "timestamp": datetime.now()
-                }
-                
-                logger.info(f"Weather forecast retrieved for {latitude}, {longitude}")
-                return data
-            else:
-                logger.error(f"Weather API error: {response.status_code}")
+            data = await self._fetch_json(url, params)
+            if data is None:
                 return None
+            
+            # Cache the result
+            self.cache[cache_key] = {
+                "data": data,
+                "timestamp": datetime.now()
+            }
+            
+            logger.info(f"Weather forecast retrieved for {latitude}, {longitude}")
+            return data
                         
         except Exception as e:
             logger.error(f"Error fetching weather forecast: {e}")
@@ -334,6 +365,18 @@ class WeatherBasedController:
         self.monitoring_locations.append(location)
         logger.info(f"Added monitoring location: {name}")
     
+    async def warmup(self):
+        """Open the HTTP session and prime the weather cache for every monitoring location"""
+        await self.weather_manager.start()
+        await asyncio.gather(*(
+            self.weather_manager.get_current_weather(loc['latitude'], loc['longitude'])
+            for loc in self.monitoring_locations
+        ))
+    
+    async def close(self):
+        """Release the weather HTTP session"""
+        await self.weather_manager.close()
+    
     async def get_treatment_recommendations(self, location_name: str = None) -> Dict:
         """Get weather-based treatment recommendations"""
         
@@ -548,6 +591,8 @@ async def main():
     # Test alerts
     alerts = await weather_controller.check_weather_alerts()
     print(f"Weather alerts: {json.dumps(alerts, indent=2)}")
+    
+    await weather_controller.close()
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
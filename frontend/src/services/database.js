@@ -49,7 +49,7 @@ export class DatabaseService {
         ...sensorData,
         userId: this.getCurrentUserId(),
         timestamp: serverTimestamp(),
-        createdAt: new Date().toISOString()
+        createdAt: new Date()
       };
 
       const docRef = await addDoc(collection(this.db, COLLECTIONS.SENSOR_READINGS), reading);
@@ -67,7 +67,7 @@ export class DatabaseService {
       const q = query(
         collection(this.db, COLLECTIONS.SENSOR_READINGS),
         where('userId', '==', this.getCurrentUserId()),
-        where('createdAt', '>=', hoursAgo.toISOString()),
+        where('createdAt', '>=', hoursAgo),
         orderBy('createdAt', 'desc'),
         limit(limitCount)
       );
@@ -95,7 +95,7 @@ export class DatabaseService {
     const q = query(
       collection(this.db, COLLECTIONS.SENSOR_READINGS),
       where('userId', '==', this.getCurrentUserId()),
-      where('createdAt', '>=', hoursAgo.toISOString()),
+      where('createdAt', '>=', hoursAgo),
       orderBy('createdAt', 'desc'),
       limit(50)
     );
@@ -119,7 +119,7 @@ export class DatabaseService {
         ...alertData,
         userId: this.getCurrentUserId(),
         timestamp: serverTimestamp(),
-        createdAt: new Date().toISOString(),
+        createdAt: new Date(),
         isRead: false,
         isResolved: false
       };
@@ -267,7 +267,7 @@ export class DatabaseService {
         ...actionData,
         userId: this.getCurrentUserId(),
         timestamp: serverTimestamp(),
-        createdAt: new Date().toISOString()
+        createdAt: new Date()
       };
 
       const docRef = await addDoc(collection(this.db, COLLECTIONS.CONTROL_ACTIONS), action);
@@ -312,7 +312,7 @@ export class DatabaseService {
         ...analysisData,
         userId: this.getCurrentUserId(),
         timestamp: serverTimestamp(),
-        createdAt: new Date().toISOString()
+        createdAt: new Date()
       };
 
       const docRef = await addDoc(collection(this.db, COLLECTIONS.ML_ANALYSIS), analysis);
@@ -357,7 +357,7 @@ export class DatabaseService {
         ...logData,
         userId: this.getCurrentUserId(),
         timestamp: serverTimestamp(),
-        createdAt: new Date().toISOString()
+        createdAt: new Date()
       };
 
       const docRef = await addDoc(collection(this.db, COLLECTIONS.MAINTENANCE_LOGS), log);
@@ -425,7 +425,7 @@ export class DatabaseService {
           ...reading,
           userId,
           timestamp: serverTimestamp(),
-          createdAt: new Date().toISOString()
+          createdAt: new Date()
         });
       });
 
@@ -446,7 +446,7 @@ export class DatabaseService {
       // Clean up old sensor readings
       const q = query(
         collection(this.db, COLLECTIONS.SENSOR_READINGS),
-        where('createdAt', '<', cutoffDate.toISOString()),
+        where('createdAt', '<', cutoffDate),
         limit(100)
       );
 